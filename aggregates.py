@@ -0,0 +1,251 @@
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, Optional, Union
+
+import pandas as pd
+
+# Bucket resolutions kept for every ticker, and their length in seconds
+RESOLUTIONS = {'1min': 60, '15min': 15 * 60, '1D': 24 * 3600}
+# The EWMA of a resolution halves an article's weight after this many buckets
+EWMA_HALFLIFE_BUCKETS = 4
+
+# Columns returned by `latest` and `range`
+AGGREGATE_COLUMNS = ['Start', 'Count', 'Mean', 'EWMA', 'Min', 'Max', 'Title_Mean', 'Content_Mean', 'Last_Time']
+
+def _epoch_seconds(times: pd.Series) -> pd.Series:
+    return (times - pd.Timestamp(0)) // pd.Timedelta(seconds=1)
+
+class SentimentAggregates:
+    def __init__(self, db_path: str, resolutions: Optional[Dict[str, int]] = None,
+                 halflife_buckets: float = EWMA_HALFLIFE_BUCKETS):
+        """
+        Per-ticker sentiment aggregates in fixed time buckets, updated as articles are scored.
+
+        Every (ticker, resolution, bucket start) row holds the article count, the sums of the
+        combined, title and content sentiment, the min/max and the EWMA as of the latest article.
+        Rows live in a B-tree keyed by (ticker, resolution, start), so the latest bucket is one
+        index lookup and a time range is one index range scan; raw rows are never read back.
+
+        Args:
+            db_path (str): Path of the SQLite database file.
+            resolutions (Dict[str, int], optional): Bucket name -> length in seconds. Defaults to RESOLUTIONS.
+            halflife_buckets (float): Half-life of the EWMA, in buckets of each resolution.
+        """
+        self.resolutions = dict(resolutions or RESOLUTIONS)
+        self.halflife_buckets = halflife_buckets
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS aggregates (
+                ticker TEXT,
+                resolution TEXT,
+                start INTEGER,
+                count INTEGER,
+                sum REAL,
+                min REAL,
+                max REAL,
+                sum_title REAL,
+                sum_content REAL,
+                ewma REAL,
+                last_time INTEGER,
+                PRIMARY KEY (ticker, resolution, start)
+            ) WITHOUT ROWID
+        """)
+        # Decayed weighted sum and weight behind each EWMA, as of the latest article seen
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS ewma_state (
+                ticker TEXT,
+                resolution TEXT,
+                weighted_sum REAL,
+                weight REAL,
+                last_time INTEGER,
+                PRIMARY KEY (ticker, resolution)
+            ) WITHOUT ROWID
+        """)
+        self._conn.commit()
+
+    def update(self, ticker: str, scored_df: pd.DataFrame, time_column: str = 'Date') -> int:
+        """
+        Adds scored articles of one ticker to every resolution's buckets.
+
+        Each article must be added once; analyze_news only passes rows not scored before.
+
+        Args:
+            ticker (str): The ticker the articles belong to.
+            scored_df (pd.DataFrame): Rows with `time_column`, 'Title_Sentiment', 'Content_Sentiment'
+                and 'Combined_Sentiment'.
+            time_column (str): Column holding the article time.
+
+        Returns:
+            int: Number of articles added.
+        """
+        times = pd.to_datetime(scored_df[time_column], errors='coerce')
+        df = pd.DataFrame({
+            'time': times,
+            'combined': pd.to_numeric(scored_df['Combined_Sentiment'], errors='coerce'),
+            'title': pd.to_numeric(scored_df['Title_Sentiment'], errors='coerce'),
+            'content': pd.to_numeric(scored_df['Content_Sentiment'], errors='coerce'),
+        }).dropna()
+        if df.empty:
+            return 0
+        df['time'] = _epoch_seconds(df['time']).astype('int64')
+        df = df.sort_values('time', kind='stable')
+        times = df['time'].to_numpy()
+        values = df['combined'].to_numpy(dtype=float)
+
+        with self._lock:
+            for resolution, seconds in self.resolutions.items():
+                df['start'] = times // seconds * seconds
+                df['ewma'] = self._advance_ewma(ticker, resolution, seconds * self.halflife_buckets, times, values)
+                buckets = df.groupby('start', sort=False).agg(
+                    articles=('combined', 'size'), total=('combined', 'sum'), low=('combined', 'min'),
+                    high=('combined', 'max'), title_total=('title', 'sum'), content_total=('content', 'sum'),
+                    ewma=('ewma', 'last'), last_time=('time', 'max'),
+                )
+                self._conn.executemany(
+                    """
+                    INSERT INTO aggregates VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (ticker, resolution, start) DO UPDATE SET
+                        count = count + excluded.count,
+                        sum = sum + excluded.sum,
+                        min = MIN(min, excluded.min),
+                        max = MAX(max, excluded.max),
+                        sum_title = sum_title + excluded.sum_title,
+                        sum_content = sum_content + excluded.sum_content,
+                        ewma = CASE WHEN excluded.last_time >= last_time THEN excluded.ewma ELSE ewma END,
+                        last_time = MAX(last_time, excluded.last_time)
+                    """,
+                    [(ticker, resolution, int(row.Index), int(row.articles), float(row.total), float(row.low),
+                      float(row.high), float(row.title_total), float(row.content_total), float(row.ewma),
+                      int(row.last_time))
+                     for row in buckets.itertuples()],
+                )
+            self._conn.commit()
+        return len(df)
+
+    def _advance_ewma(self, ticker: str, resolution: str, halflife: float, times, values) -> list:
+        """
+        Folds sorted articles into a ticker's time-decayed EWMA and returns its value after each one.
+        Articles older than the latest one seen are decayed to that time, so late arrivals still count.
+        """
+        row = self._conn.execute(
+            "SELECT weighted_sum, weight, last_time FROM ewma_state WHERE ticker = ? AND resolution = ?",
+            (ticker, resolution),
+        ).fetchone()
+        weighted_sum, weight, last_time = row if row is not None else (0.0, 0.0, None)
+
+        ewmas = []
+        for time, value in zip(times, values):
+            if last_time is None or time >= last_time:
+                decay = 0.5 ** ((time - last_time) / halflife) if last_time is not None else 0.0
+                weighted_sum, weight, last_time = weighted_sum * decay + value, weight * decay + 1.0, int(time)
+            else:
+                decay = 0.5 ** ((last_time - time) / halflife)
+                weighted_sum, weight = weighted_sum + value * decay, weight + decay
+            ewmas.append(weighted_sum / weight)
+
+        self._conn.execute(
+            "INSERT OR REPLACE INTO ewma_state VALUES (?, ?, ?, ?, ?)",
+            (ticker, resolution, weighted_sum, weight, last_time),
+        )
+        return ewmas
+
+    @staticmethod
+    def _to_record(row) -> Dict:
+        start, count, total, low, high, title_total, content_total, ewma, last_time = row
+        return {
+            'Start': pd.Timestamp(start, unit='s'),
+            'Count': count,
+            'Mean': total / count,
+            'EWMA': ewma,
+            'Min': low,
+            'Max': high,
+            'Title_Mean': title_total / count,
+            'Content_Mean': content_total / count,
+            'Last_Time': pd.Timestamp(last_time, unit='s'),
+        }
+
+    def latest(self, ticker: str, resolution: str = '15min') -> Optional[Dict]:
+        """
+        Returns the most recent bucket of a ticker, or None if it has no articles.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                """
+                SELECT start, count, sum, min, max, sum_title, sum_content, ewma, last_time FROM aggregates
+                WHERE ticker = ? AND resolution = ? ORDER BY start DESC LIMIT 1
+                """,
+                (ticker, resolution),
+            ).fetchone()
+        return self._to_record(row) if row is not None else None
+
+    def range(self, ticker: str, resolution: str = '15min', start: Optional[pd.Timestamp] = None,
+              end: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+        """
+        Returns a ticker's buckets starting between `start` and `end` (inclusive), oldest first.
+
+        Args:
+            ticker (str): The ticker.
+            resolution (str): One of the configured resolutions, e.g. '1min', '15min' or '1D'.
+            start (pd.Timestamp, optional): Earliest bucket start. Unbounded if None.
+            end (pd.Timestamp, optional): Latest bucket start. Unbounded if None.
+
+        Returns:
+            pd.DataFrame: One row per bucket with the AGGREGATE_COLUMNS.
+        """
+        if resolution not in self.resolutions:
+            raise ValueError(f"Unknown resolution {resolution}; expected one of {list(self.resolutions)}")
+        seconds = self.resolutions[resolution]
+        # Buckets are keyed by their start, so a start time inside a bucket selects that bucket
+        low = pd.Timestamp(start).value // 10 ** 9 // seconds * seconds if start is not None else -2 ** 62
+        high = pd.Timestamp(end).value // 10 ** 9 if end is not None else 2 ** 62
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT start, count, sum, min, max, sum_title, sum_content, ewma, last_time FROM aggregates
+                WHERE ticker = ? AND resolution = ? AND start BETWEEN ? AND ? ORDER BY start
+                """,
+                (ticker, resolution, low, high),
+            ).fetchall()
+        return pd.DataFrame([self._to_record(row) for row in rows], columns=AGGREGATE_COLUMNS)
+
+    def reset(self, ticker: str):
+        """
+        Removes every bucket and EWMA state of a ticker, e.g. before rebuilding it from the CSV.
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM aggregates WHERE ticker = ?", (ticker,))
+            self._conn.execute("DELETE FROM ewma_state WHERE ticker = ?", (ticker,))
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+def rebuild_from_csv(aggregates: SentimentAggregates, ticker: str, csv_paths: Union[str, Iterable[str]],
+                     chunksize: int = 100000) -> int:
+    """
+    Replaces a ticker's aggregates with those of its sentiment CSVs, e.g. for history scored
+    before the aggregates existed. The CSVs are read in chunks, so memory stays bounded.
+
+    Args:
+        aggregates (SentimentAggregates): The aggregates to rebuild.
+        ticker (str): The ticker.
+        csv_paths (str or Iterable[str]): The ticker's sentiment CSV, or its archived days followed by
+            the working file as listed by `history.history_files`, so archived history is kept.
+        chunksize (int): Rows read at a time.
+
+    Returns:
+        int: Number of articles added.
+    """
+    csv_paths = [csv_paths] if isinstance(csv_paths, str) else list(csv_paths)
+    aggregates.reset(ticker)
+    columns = ['Date', 'Title_Sentiment', 'Content_Sentiment', 'Combined_Sentiment']
+    added = 0
+    for csv_path in csv_paths:
+        if not os.path.exists(csv_path) or os.path.getsize(csv_path) == 0:
+            continue
+        for chunk in pd.read_csv(csv_path, usecols=columns, chunksize=chunksize):
+            added += aggregates.update(ticker, chunk, 'Date')
+    return added
@@ -0,0 +1,104 @@
+from typing import Dict, Iterable, Optional
+
+import pandas as pd
+
+def time_of_day(timestamps: pd.Series) -> pd.Series:
+    """
+    Maps timestamps onto 1900-01-01 keeping only their time of day, so several days
+    can be drawn on the same intraday axis.
+    """
+    return pd.Timestamp(1900, 1, 1) + (timestamps - timestamps.dt.normalize())
+
+def asof_join_prices(sentiment_df: pd.DataFrame, price_df: pd.DataFrame,
+                     tolerance: Optional[pd.Timedelta] = None) -> pd.DataFrame:
+    """
+    Attaches to every article the last price of its ticker known at the article's time.
+
+    Args:
+        sentiment_df (pd.DataFrame): Scored articles with 'Ticker' and 'Date'.
+        price_df (pd.DataFrame): Price snapshots with 'Ticker', 'Exported_At' and 'Price'.
+        tolerance (pd.Timedelta, optional): Ignore prices older than this.
+
+    Returns:
+        pd.DataFrame: The articles with the matched 'Price' and its 'Exported_At'.
+    """
+    left = sentiment_df.sort_values('Date')
+    right = price_df[['Ticker', 'Exported_At', 'Price']].sort_values('Exported_At')
+    # merge_asof needs the `by` keys to share a dtype
+    left = left.assign(Ticker=left['Ticker'].astype(str))
+    right = right.assign(Ticker=right['Ticker'].astype(str))
+    return pd.merge_asof(left, right, left_on='Date', right_on='Exported_At', by='Ticker',
+                         tolerance=tolerance, direction='backward')
+
+def align_sentiment_and_price(sentiment_df: pd.DataFrame, price_df: pd.DataFrame, freq: str = '15min',
+                              sentiment_column: str = 'Combined_Sentiment') -> pd.DataFrame:
+    """
+    Resamples sentiment and prices of every ticker into the same fixed bars.
+
+    Args:
+        sentiment_df (pd.DataFrame): Scored articles with 'Ticker', 'Date' and `sentiment_column`.
+        price_df (pd.DataFrame): Price snapshots with 'Ticker', 'Exported_At' and 'Price'.
+        freq (str): Bar size, as a pandas offset alias.
+        sentiment_column (str): Sentiment score to aggregate.
+
+    Returns:
+        pd.DataFrame: Indexed by (Ticker, bar start) with 'Sentiment_Mean', 'Sentiment_Count',
+            'Price' (last known price at the end of the bar) and 'Return' (bar-to-bar price change).
+    """
+    sentiment = sentiment_df.dropna(subset=['Date'])
+    prices = price_df.dropna(subset=['Exported_At'])
+
+    sentiment_bars = (
+        sentiment.set_index('Date')
+        .groupby('Ticker', observed=True)[sentiment_column]
+        .resample(freq)
+        .agg(['mean', 'count'])
+        .rename(columns={'mean': 'Sentiment_Mean', 'count': 'Sentiment_Count'})
+    )
+    price_bars = (
+        prices.set_index('Exported_At')
+        .groupby('Ticker', observed=True)['Price']
+        .resample(freq)
+        .last()
+    )
+    sentiment_bars.index.names = ['Ticker', 'Bar']
+    price_bars.index.names = ['Ticker', 'Bar']
+    # Tickers are converted to strings per bar rather than per row; categorical tickers of the
+    # two inputs have different categories and could not be joined
+    sentiment_bars.index = sentiment_bars.index.set_levels(sentiment_bars.index.levels[0].astype(str), level='Ticker')
+    price_bars.index = price_bars.index.set_levels(price_bars.index.levels[0].astype(str), level='Ticker')
+
+    bars = sentiment_bars.join(price_bars, how='outer').sort_index()
+    bars['Sentiment_Count'] = bars['Sentiment_Count'].fillna(0).astype(int)
+    # Carry the last price forward into bars without a snapshot
+    bars['Price'] = bars.groupby(level='Ticker')['Price'].ffill()
+    bars['Return'] = bars.groupby(level='Ticker')['Price'].pct_change(fill_method=None)
+    return bars
+
+def split_by_ticker(bars: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    """
+    Splits aligned bars into one frame per ticker, indexed by bar start.
+    """
+    return {ticker: frame.droplevel('Ticker') for ticker, frame in bars.groupby(level='Ticker')}
+
+def lead_lag_correlation(bars: pd.DataFrame, lags: Iterable[int] = range(-4, 5)) -> pd.DataFrame:
+    """
+    Correlates bar sentiment with bar returns shifted by each lag, per ticker.
+    A positive lag compares sentiment with the return `lag` bars later.
+
+    Args:
+        bars (pd.DataFrame): Output of `align_sentiment_and_price`.
+        lags (Iterable[int]): Lags in bars.
+
+    Returns:
+        pd.DataFrame: One row per ticker, one column per lag.
+    """
+    by_ticker = bars.groupby(level='Ticker')
+    correlations = {}
+    for lag in lags:
+        pairs = pd.DataFrame({
+            'Sentiment': bars['Sentiment_Mean'],
+            'Return': by_ticker['Return'].shift(-lag),
+        })
+        correlations[lag] = pairs.groupby(level='Ticker').corr().xs('Sentiment', level=1)['Return']
+    return pd.DataFrame(correlations)
@@ -1,160 +1,322 @@
 import pandas as pd
 import os
 import requests
-from bs4 import BeautifulSoup
-from finvader import finvader
-import time
+from typing import List, Optional, Tuple
+from concurrent.futures import Executor, ProcessPoolExecutor
+from urllib.parse import urlsplit
+from aggregates import SentimentAggregates
+from config import Config, load_config
+from fetcher import ArticleFetcher, DEFAULT_HEADERS
+from extract import DEFAULT_MAX_BYTES, extract_article_text, read_capped
+from article_cache import ArticleCache
+from processed_index import ProcessedIndex, content_hash
+from scoring import ScoreCache, score_chunked, score_texts
+from storage import PartitionedStore
+import metrics
 
-# Define the input directory containing CSV files for each ticker
-input_dir = os.path.expanduser(r"/Users/apspa/Documents/PSU/RESEARCH PROJECT/Code/outputs/")
+# Article content is scored in chunks of at most CONTENT_TOKEN_BUDGET tokens, and at most
+# MAX_CHUNKS_PER_ARTICLE chunks per article, which bounds the scoring time of very long pages
+CONTENT_TOKEN_BUDGET = 200
+MAX_CHUNKS_PER_ARTICLE = 16
 
-# Define the output directory to save sentiment analysis results
-output_dir = os.path.expanduser(r"/Users/apspa/Documents/PSU/RESEARCH PROJECT/Code/outputs/")
+class AnalysisContext:
+    def __init__(self, output_dir: str):
+        """
+        Opens the fetcher, caches and store shared by every file scored into `output_dir`.
 
-# Create the output directory if it doesn't exist
-os.makedirs(output_dir, exist_ok=True)
+        Args:
+            output_dir (str): Directory of the sentiment CSVs; the caches and the store live there too.
+        """
+        self.output_dir = output_dir
+        # Create the output directory if it doesn't exist
+        os.makedirs(output_dir, exist_ok=True)
 
-# Function to analyze sentiment of text
-def analyze_sentiment(text: str) -> float:
-    """
-    Analyze the sentiment of the given text and return the sentiment score.
-    
-    Args:
-        text (str): The text to analyze.
-    
-    Returns:
-        float: The sentiment score.
-    """
-    # Perform sentiment analysis using Finvader
-    sentiment_result = finvader(text, use_sentibignomics=True, use_henry=True, indicator='compound')
-    
-    # Check if the result is a dictionary and contains 'compound' key
-    if isinstance(sentiment_result, dict) and 'compound' in sentiment_result:
-        return sentiment_result['compound']
-    return sentiment_result if isinstance(sentiment_result, float) else 0.0
+        # Shared fetcher: pooled connections, per-host rate limits and request timeouts
+        self.fetcher = ArticleFetcher(max_workers=16, per_host_interval=1.0, timeout=10.0)
+
+        # Local store of fetched articles, so reruns do not refetch or re-parse them
+        self.article_cache = ArticleCache(os.path.join(output_dir, 'article_cache.sqlite'))
+
+        # Scores memoized by normalized-text hash, so syndicated titles and bodies are scored once
+        self.score_cache = ScoreCache(os.path.join(output_dir, 'score_cache.sqlite'))
+
+        # Parquet store (partitioned by date and ticker) the scored rows are also appended to
+        self.store = PartitionedStore(os.path.join(output_dir, 'store'))
+
+        # Per-ticker bucket aggregates, so current sentiment is read without rescanning the CSVs
+        self.aggregates = SentimentAggregates(os.path.join(output_dir, 'sentiment_aggregates.sqlite'))
+
+    def fetch(self, url: str) -> str:
+        """
+        Fetch the content of an article with the shared fetcher and article cache.
+        """
+        return fetch_article_content(url, self.fetcher, self.article_cache)
+
+    def close(self):
+        """
+        Trims the article cache to its limits and closes everything opened by the context.
+        """
+        # Keep the article store within its size and age limits
+        print(f"Evicted {self.article_cache.evict()} cached articles")
+        self.article_cache.close()
+        self.score_cache.close()
+        self.aggregates.close()
+        self.fetcher.close()
 
 # Function to fetch article content from a URL
-def fetch_article_content(url: str) -> str:
+def fetch_article_content(url: str, fetcher: Optional[ArticleFetcher] = None,
+                          cache: Optional[ArticleCache] = None,
+                          max_bytes: int = DEFAULT_MAX_BYTES) -> str:
     """
     Fetch the content of an article from a given URL.
     
     Args:
         url (str): The URL of the article.
+        fetcher (ArticleFetcher, optional): Fetcher whose pooled session is used.
+            If None, a one-off request is made with the default headers.
+        cache (ArticleCache, optional): Article store checked before the network.
+            If None, the article is always fetched.
+        max_bytes (int): Maximum number of bytes of the page that are downloaded.
     
     Returns:
         str: The content of the article.
     """
-    # Define headers to mimic a real browser request
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
+    # Serve fresh cached articles without contacting the publisher
+    cached = cache.get(url) if cache is not None else None
+    if cached is not None and cache.is_fresh(cached):
+        metrics.inc('article_cache_total', result='hit')
+        return cached['text']
+    metrics.inc('article_cache_total', result='stale' if cached is not None else 'miss')
+
     try:
-        # Make a request to the article URL
-        response = requests.get(url, headers=headers)
+        # Make a request to the article URL, revalidating a stale cached copy if there is one
+        conditional_headers = ArticleCache.conditional_headers(cached)
+        # The body is streamed so that at most max_bytes of it are downloaded
+        if fetcher is not None:
+            response = fetcher.get(url, headers=conditional_headers, stream=True)
+        else:
+            response = requests.get(url, headers={**DEFAULT_HEADERS, **conditional_headers}, timeout=10.0,
+                                    stream=True)
         
+        # The cached copy is still current
+        if response.status_code == 304 and cached is not None:
+            response.close()
+            metrics.inc('article_cache_total', result='revalidated')
+            cache.touch(url)
+            return cached['text']
+
         # Check if the request was successful
         if response.status_code == 200:
-            soup = BeautifulSoup(response.content, 'html.parser')
-            # Extract all paragraph text from the article
-            paragraphs = soup.find_all('p')
-            article_text = ' '.join([para.get_text() for para in paragraphs])
+            html = read_capped(response, max_bytes)
+            metrics.inc('bytes_downloaded_total', len(html), host=urlsplit(url).netloc)
+            # Extract the article body without navigation, banners and footers
+            article_text = extract_article_text(html)
+            # Pages without text are fetched again next time rather than served empty from the cache
+            if cache is not None and article_text:
+                cache.put(url, html, article_text,
+                          response.headers.get('ETag'), response.headers.get('Last-Modified'))
             return article_text
         else:
+            response.close()
             print(f"Failed to fetch article from {url}: {response.status_code}")
             return ""
     except Exception as e:
         print(f"Error fetching article from {url}: {e}")
         return ""
 
-# Process each CSV file in the input directory
-for filename in os.listdir(input_dir):
-    if filename.endswith('.csv') and not filename.endswith('_with_sentiment.csv'):
-        # Define the input and output file paths
-        input_file_path = os.path.join(input_dir, filename)
-        output_file_path = os.path.join(output_dir, f"{os.path.splitext(filename)[0]}_with_sentiment.csv")
-        
-        # Print debugging information
-        print(f"Processing file: {input_file_path}")
-        print(f"Output file path: {output_file_path}")
-        
-        # Read the CSV file into a DataFrame
+def load_processed_index(output_file_path: str) -> ProcessedIndex:
+    """
+    Load the index of links already scored into the given output file.
+    
+    Args:
+        output_file_path (str): Path of the *_with_sentiment.csv file.
+    
+    Returns:
+        ProcessedIndex: Index of processed links and their content hashes.
+    """
+    index_path = f"{os.path.splitext(output_file_path)[0]}.links"
+    bootstrap = not os.path.exists(index_path)
+    index = ProcessedIndex(index_path)
+
+    # An index outliving its emptied or deleted output file would keep its articles from being scored again
+    output_empty = not os.path.isfile(output_file_path) or os.path.getsize(output_file_path) == 0
+    if not bootstrap and len(index) and output_empty:
+        print(f"{output_file_path} is empty, resetting its link index ({index.clear()} links)")
+
+    # Seed a missing index from the links already present in the output file
+    if bootstrap and os.path.isfile(output_file_path) and os.path.getsize(output_file_path) > 0:
         try:
-            news_df = pd.read_csv(input_file_path)
-        except pd.errors.EmptyDataError:
-            print(f"Skipping empty file: {input_file_path}")
-            continue
-        
-        # Print the column names to debug
-        print(f"Columns in {filename}: {news_df.columns.tolist()}")
-
-        # Check if required columns exist
-        required_columns = ['Link', 'Title']
-        missing_columns = [col for col in required_columns if col not in news_df.columns]
-
-        if missing_columns:
-            print(f"Missing columns {missing_columns} in {filename}")
-            continue  # Skip this file or handle it as needed
-
-        # Initialize lists to store sentiment scores
-        title_sentiments = []
-        content_sentiments = []
-        combined_sentiments = []
-
-        # Loop through each URL in the DataFrame
-        for index, row in news_df.iterrows():
-            try:
-                url = row['Link']
-                title = row['Title']
-                print(f"Processing URL: {url}")
-                
-                # Fetch article content
-                content = fetch_article_content(url)
-                
-                if content and title:
-                    # Analyze sentiment for title and content
-                    title_sentiment = analyze_sentiment(title)
-                    content_sentiment = analyze_sentiment(content)
-                    
-                    # Calculate combined sentiment as the average of title and content sentiments
-                    combined_sentiment = (title_sentiment + content_sentiment) / 2
-                    
-                    # Append results to lists
-                    title_sentiments.append(title_sentiment)
-                    content_sentiments.append(content_sentiment)
-                    combined_sentiments.append(combined_sentiment)
-                else:
-                    # Handle cases where content could not be fetched
-                    title_sentiments.append(None)
-                    content_sentiments.append(None)
-                    combined_sentiments.append(None)
-                
-                # Optional: delay to avoid overwhelming the server
-                time.sleep(1)  # Adjust delay as needed
-            except KeyError as e:
-                print(f"Error processing row {index}: {e}")
-                continue
-
-        # Add sentiment scores to DataFrame
-        news_df['Title_Sentiment'] = title_sentiments
-        news_df['Content_Sentiment'] = content_sentiments
-        news_df['Combined_Sentiment'] = combined_sentiments
-
-        # Check if the output file exists and is not empty
-        if os.path.isfile(output_file_path):
-            if os.stat(output_file_path).st_size == 0:
-                print(f"File is empty, writing new data: {output_file_path}")
-                news_df.to_csv(output_file_path, index=False)
-            else:
-                print(f"Appending to existing file: {output_file_path}")
-                # If the file exists and is not empty, read it first
-                existing_df = pd.read_csv(output_file_path)
-                # Concatenate the new data with the existing data
-                combined_df = pd.concat([existing_df, news_df], ignore_index=True)
-                # Save the combined data to the file, overwriting it
-                combined_df.to_csv(output_file_path, index=False)
-        else:
-            print(f"Creating new file: {output_file_path}")
-            # If the file doesn't exist, just save the new data
-            news_df.to_csv(output_file_path, index=False)
+            existing_links = pd.read_csv(output_file_path, usecols=['Link'])['Link'].dropna()
+            index.add_many((link, '') for link in existing_links)
+        except (pd.errors.EmptyDataError, ValueError) as e:
+            print(f"Could not seed link index from {output_file_path}: {e}")
+    return index
+
+def score_articles(titles: List[str], article_texts: List[str], executor: Optional[Executor] = None,
+                   cache: Optional[ScoreCache] = None) -> Tuple[List[float], List[float], List[List[Tuple[int, float]]]]:
+    """
+    Score the titles and the chunked contents of a batch of articles.
+    
+    Args:
+        titles (List[str]): Article titles.
+        article_texts (List[str]): Article contents, in the same order.
+        executor (Executor, optional): Process pool used for sentiment scoring.
+        cache (ScoreCache, optional): Scores reused across titles, articles and runs.
+    
+    Returns:
+        Tuple: Title scores, length-weighted content scores, and the (tokens, score) of every scored content chunk.
+    """
+    title_sentiments = score_texts(titles, cache=cache, executor=executor)
+    content_results = score_chunked(article_texts, CONTENT_TOKEN_BUDGET, MAX_CHUNKS_PER_ARTICLE,
+                                    cache=cache, executor=executor)
+    content_sentiments = [score for score, _ in content_results]
+    chunk_scores = [chunks for _, chunks in content_results]
+    return title_sentiments, content_sentiments, chunk_scores
+
+def save_scored_articles(scored_df: pd.DataFrame, content_hashes: List[str], ticker: str,
+                         output_file_path: str, processed_index: ProcessedIndex,
+                         chunk_scores: Optional[List[List[Tuple[int, float]]]] = None,
+                         store: Optional[PartitionedStore] = None,
+                         aggregates: Optional[SentimentAggregates] = None):
+    """
+    Append scored articles to the sentiment CSV (and the store and aggregates), then record their links.
+    
+    Args:
+        scored_df (pd.DataFrame): News rows with the sentiment columns added.
+        content_hashes (List[str]): Hash of title and content of each row.
+        ticker (str): The ticker the articles belong to.
+        output_file_path (str): Path of the *_with_sentiment.csv file.
+        processed_index (ProcessedIndex): Index of the output file's processed links.
+        chunk_scores (List[List[Tuple[int, float]]], optional): (tokens, score) of the content chunks
+            of each row, saved to the store's 'sentiment_chunks' dataset.
+        store (PartitionedStore, optional): Store the rows are also appended to.
+        aggregates (SentimentAggregates, optional): Bucket aggregates the rows are added to.
+    """
+    # Append the new rows; write the header only when starting a new or empty file
+    write_header = not os.path.isfile(output_file_path) or os.path.getsize(output_file_path) == 0
+    print(f"{'Creating' if write_header else 'Appending to'} file: {output_file_path}")
+    scored_df.to_csv(output_file_path, mode='a', header=write_header, index=False)
+    metrics.inc('rows_written_total', len(scored_df), dataset='sentiment')
+
+    # Append the same rows to the partitioned store
+    if store is not None and 'Date' in scored_df.columns:
+        store.append('sentiment', scored_df.assign(Ticker=ticker), 'Date')
+
+        # Keep the per-chunk content scores for later analysis
+        if chunk_scores is not None:
+            chunk_rows = [
+                {'Ticker': ticker, 'Date': date, 'Link': link, 'Chunk': number, 'Tokens': tokens, 'Chunk_Sentiment': score}
+                for date, link, chunks in zip(scored_df['Date'], scored_df['Link'], chunk_scores)
+                for number, (tokens, score) in enumerate(chunks)
+            ]
+            store.append('sentiment_chunks', pd.DataFrame(chunk_rows), 'Date')
+
+    # Fold the rows into the ticker's 1min/15min/1D buckets
+    if aggregates is not None and 'Date' in scored_df.columns:
+        aggregates.update(ticker, scored_df, 'Date')
+
+    # Record the links only once their rows are safely on disk
+    processed_index.add_many(zip(scored_df['Link'], content_hashes))
+
+def analyze_file(input_file_path: str, output_file_path: str, context: AnalysisContext,
+                 executor: Optional[Executor] = None):
+    """
+    Score the articles of one news CSV that have not been scored before,
+    and append them to the sentiment CSV.
+    
+    Args:
+        input_file_path (str): Path of the *_today_news.csv file.
+        output_file_path (str): Path of the *_with_sentiment.csv file.
+        context (AnalysisContext): Fetcher, caches and store to use.
+        executor (Executor, optional): Process pool used for sentiment scoring.
+    """
+    # Print debugging information
+    print(f"Processing file: {input_file_path}")
+    print(f"Output file path: {output_file_path}")
+    
+    # Read the CSV file into a DataFrame
+    try:
+        news_df = pd.read_csv(input_file_path)
+    except pd.errors.EmptyDataError:
+        print(f"Skipping empty file: {input_file_path}")
+        return
+    
+    # Print the column names to debug
+    print(f"Columns in {os.path.basename(input_file_path)}: {news_df.columns.tolist()}")
+
+    # Check if required columns exist
+    required_columns = ['Link', 'Title']
+    missing_columns = [col for col in required_columns if col not in news_df.columns]
+
+    if missing_columns:
+        print(f"Missing columns {missing_columns} in {os.path.basename(input_file_path)}")
+        return  # Skip this file or handle it as needed
+
+    # Keep only rows whose link has not been scored yet
+    processed_index = load_processed_index(output_file_path)
+    news_df = news_df.dropna(subset=['Link']).drop_duplicates(subset=['Link'])
+    news_df = news_df[~news_df['Link'].isin(processed_index.keys())]
+    if news_df.empty:
+        print(f"No new articles in {input_file_path}")
+        return
+    print(f"{len(news_df)} new articles to score")
+
+    # Fetch all articles of the file concurrently before scoring them
+    contents = context.fetcher.fetch_all(news_df['Link'], context.fetch)
+
+    # Rows whose article could not be fetched are left out so they are retried on the next run
+    news_df['Content'] = news_df['Link'].map(contents).fillna("")
+    scorable = (news_df['Content'] != "") & news_df['Title'].notna() & (news_df['Title'] != "")
+    for url in news_df.loc[~scorable, 'Link']:
+        print(f"Skipping URL without title or content: {url}")
+    news_df = news_df[scorable].copy()
+    if news_df.empty:
+        print(f"No articles could be scored in {input_file_path}")
+        return
+
+    # Score all titles and contents of the file in one batch
+    titles = news_df['Title'].astype(str).tolist()
+    article_texts = news_df['Content'].tolist()
+    title_sentiments, content_sentiments, chunk_scores = score_articles(titles, article_texts, executor,
+                                                                       context.score_cache)
+
+    # Add sentiment scores to DataFrame
+    news_df['Title_Sentiment'] = title_sentiments
+    news_df['Content_Sentiment'] = content_sentiments
+    # Calculate combined sentiment as the average of title and content sentiments
+    news_df['Combined_Sentiment'] = (news_df['Title_Sentiment'] + news_df['Content_Sentiment']) / 2
+    content_hashes = [content_hash(title, text) for title, text in zip(titles, article_texts)]
+    news_df = news_df.drop(columns=['Content'])
+
+    ticker = os.path.basename(input_file_path).split('_')[0]
+    save_scored_articles(news_df, content_hashes, ticker, output_file_path, processed_index, chunk_scores,
+                         context.store, context.aggregates)
+
+def main(config: Optional[Config] = None, input_dir: Optional[str] = None):
+    """
+    Score new articles of every news CSV in the input directory.
+
+    Args:
+        config (Config, optional): Directories to use. Loaded with `load_config` if None.
+        input_dir (str, optional): Directory of the news CSVs. Defaults to the output directory.
+    """
+    config = config or load_config()
+    input_dir = input_dir or config.output_dir
+    context = AnalysisContext(config.output_dir)
+
+    # Share one process pool for scoring across all files
+    with ProcessPoolExecutor() as executor:
+        # Process each CSV file in the input directory
+        for filename in os.listdir(input_dir):
+            if filename.endswith('.csv') and not filename.endswith('_with_sentiment.csv'):
+                # Define the input and output file paths
+                input_file_path = os.path.join(input_dir, filename)
+                output_file_path = os.path.join(config.output_dir, f"{os.path.splitext(filename)[0]}_with_sentiment.csv")
+                analyze_file(input_file_path, output_file_path, context, executor)
+
+    context.close()
+    metrics.write_reports(config.metrics_dir, 'analyze_news')
+    print("All sentiment analyses have been completed and saved.")
 
-print("All sentiment analyses have been completed and saved.")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+class ArticleCache:
+    def __init__(self, db_path: str, max_bytes: int = 500 * 1024 * 1024,
+                 max_age_days: float = 30, revalidate_after_hours: float = 24):
+        """
+        On-disk store of raw article HTML and extracted text, keyed by URL.
+
+        Args:
+            db_path (str): Path of the SQLite database file.
+            max_bytes (int): Total size of stored HTML and text kept after eviction.
+            max_age_days (float): Entries fetched longer ago than this are evicted.
+            revalidate_after_hours (float): Entries younger than this are served
+                without contacting the publisher; older ones are revalidated.
+        """
+        self.max_bytes = max_bytes
+        self.max_age = max_age_days * 24 * 3600
+        self.revalidate_after = revalidate_after_hours * 3600
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS articles (
+                url TEXT PRIMARY KEY,
+                html BLOB,
+                text TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL,
+                accessed_at REAL,
+                size INTEGER
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS articles_accessed_at ON articles (accessed_at)")
+        self._conn.commit()
+
+    def get(self, url: str) -> Optional[Dict]:
+        """
+        Returns the cached entry for `url`, or None if it is not stored.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT text, etag, last_modified, fetched_at FROM articles WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE articles SET accessed_at = ? WHERE url = ?", (time.time(), url))
+            self._conn.commit()
+        return {'text': row[0], 'etag': row[1], 'last_modified': row[2], 'fetched_at': row[3]}
+
+    def is_fresh(self, entry: Dict) -> bool:
+        """
+        Checks whether an entry can be used without revalidating it.
+        """
+        return time.time() - entry['fetched_at'] < self.revalidate_after
+
+    @staticmethod
+    def conditional_headers(entry: Optional[Dict]) -> Dict[str, str]:
+        """
+        Builds If-None-Match / If-Modified-Since headers for revalidating an entry.
+        """
+        headers = {}
+        if entry is not None:
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def put(self, url: str, html: bytes, text: str, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        """
+        Stores (or replaces) the raw HTML and extracted text of an article.
+        """
+        now = time.time()
+        size = len(html) + len(text.encode('utf-8'))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO articles VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, html, text, etag, last_modified, now, now, size),
+            )
+            self._conn.commit()
+
+    def touch(self, url: str):
+        """
+        Marks an entry as revalidated (e.g. after a 304 Not Modified response).
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("UPDATE articles SET fetched_at = ?, accessed_at = ? WHERE url = ?", (now, now, url))
+            self._conn.commit()
+
+    def evict(self) -> int:
+        """
+        Removes entries older than the age limit, then the least recently used
+        entries until the store fits in the size limit.
+
+        Returns:
+            int: Number of entries removed.
+        """
+        with self._lock:
+            removed = self._conn.execute(
+                "DELETE FROM articles WHERE fetched_at < ?", (time.time() - self.max_age,)
+            ).rowcount
+
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM articles").fetchone()[0]
+            if total > self.max_bytes:
+                # Walk entries from least to most recently used until enough space is freed
+                to_delete = []
+                for url, size in self._conn.execute("SELECT url, size FROM articles ORDER BY accessed_at"):
+                    if total <= self.max_bytes:
+                        break
+                    to_delete.append((url,))
+                    total -= size
+                self._conn.executemany("DELETE FROM articles WHERE url = ?", to_delete)
+                removed += len(to_delete)
+            self._conn.commit()
+        return removed
+
+    def close(self):
+        """
+        Closes the database connection.
+        """
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,273 @@
+import argparse
+import datetime
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+# Make the repository's modules importable when run as `python benchmarks/run_benchmarks.py`
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from server import ARTICLE_SENTENCES, StandInServer, build_article
+
+DEFAULT_SIZES = [10, 1000, 10000]
+STAGES = ['export', 'fetch', 'extract', 'sentiment', 'bothplot']
+
+def summarize(stage: str, size: int, latencies: List[float], elapsed: float, items: int) -> Dict:
+    """
+    Builds one result record from per-operation latencies (seconds).
+    """
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        'stage': stage,
+        'size': size,
+        'operations': len(latencies),
+        'seconds': round(elapsed, 4),
+        'throughput_per_second': round(items / elapsed, 2) if elapsed else None,
+        'p50_ms': round(float(np.percentile(latencies_ms, 50)), 3) if len(latencies_ms) else None,
+        'p99_ms': round(float(np.percentile(latencies_ms, 99)), 3) if len(latencies_ms) else None,
+    }
+
+def timed(func: Callable, *args, **kwargs):
+    """
+    Runs `func` and returns (result, seconds).
+    """
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+def bench_export(base_url: str, size: int, work_dir: str, repeats: int = 5) -> Dict:
+    """
+    Snapshot fetch + append for `size` tickers, repeated `repeats` times.
+    """
+    import export
+    from storage import PartitionedStore
+
+    tickers = [f"T{number:05d}" for number in range(size)]
+    urls = export.build_export_urls(tickers, 'token', base_url=f"{base_url}/export.ashx")
+    output_path = os.path.join(work_dir, f"export_{size}.csv")
+    store = PartitionedStore(os.path.join(work_dir, 'store'))
+
+    latencies = []
+    with export.create_session(8) as session:
+        started = time.perf_counter()
+        for _ in range(repeats):
+            operation_started = time.perf_counter()
+            snapshot = export.fetch_snapshot(urls, session, retries=0)
+            export.write_snapshot(snapshot, output_path, store)
+            latencies.append(time.perf_counter() - operation_started)
+        elapsed = time.perf_counter() - started
+    return summarize('export', size, latencies, elapsed, size * repeats)
+
+def bench_fetch(base_url: str, size: int, article_bytes: int) -> Dict:
+    """
+    Concurrent article fetch + text extraction for `size` distinct article pages.
+    """
+    from analyze_news import fetch_article_content
+    from fetcher import ArticleFetcher
+
+    urls = [f"{base_url}/article/{number}?size={article_bytes}" for number in range(size)]
+    latencies = []
+    with ArticleFetcher(max_workers=16, per_host_interval=0.0) as article_fetcher:
+        def fetch(url: str) -> str:
+            text, seconds = timed(fetch_article_content, url, article_fetcher, None)
+            latencies.append(seconds)
+            return text
+
+        _, elapsed = timed(article_fetcher.fetch_all, urls, fetch)
+    return summarize('fetch', size, latencies, elapsed, size)
+
+def load_corpus(size: int, article_bytes: int, corpus_dir: str = None) -> List[bytes]:
+    """
+    Returns `size` article pages: saved .html files from `corpus_dir` (repeated as needed),
+    or synthetic pages if no directory is given.
+    """
+    if corpus_dir is None:
+        return [build_article(number, article_bytes) for number in range(size)]
+    paths = sorted(os.path.join(corpus_dir, name) for name in os.listdir(corpus_dir) if name.endswith('.html'))
+    if not paths:
+        raise ValueError(f"No .html files in {corpus_dir}")
+    saved = []
+    for path in paths[:size]:
+        with open(path, 'rb') as file:
+            saved.append(file.read())
+    return [saved[number % len(saved)] for number in range(size)]
+
+def bench_extract(pages: List[bytes], engine: str) -> Dict:
+    """
+    HTML-to-text extraction of the given article pages with the given engine.
+    Also reports the mean extracted text length, i.e. what would be sent to finvader.
+    """
+    from extract import extract_article_text
+
+    size = len(pages)
+    latencies = []
+    text_lengths = []
+    started = time.perf_counter()
+    for page in pages:
+        text, seconds = timed(extract_article_text, page, engine)
+        latencies.append(seconds)
+        text_lengths.append(len(text))
+    elapsed = time.perf_counter() - started
+    result = summarize(f"extract[{engine}]", size, latencies, elapsed, size)
+    result['mean_text_chars'] = round(float(np.mean(text_lengths)), 1)
+    return result
+
+def synthetic_texts(size: int, sentences: int = 20) -> List[str]:
+    """
+    Builds `size` distinct article-like texts.
+    """
+    rng = np.random.default_rng(size)
+    return [
+        f"Article {number}. " + ' '.join(rng.choice(ARTICLE_SENTENCES, sentences))
+        for number in range(size)
+    ]
+
+def bench_sentiment(size: int) -> Dict:
+    """
+    Scores `size` distinct texts one by one with analyze_sentiment.
+    """
+    from scoring import analyze_sentiment
+
+    latencies = []
+    started = time.perf_counter()
+    for text in synthetic_texts(size):
+        _, seconds = timed(analyze_sentiment, text)
+        latencies.append(seconds)
+    elapsed = time.perf_counter() - started
+    return summarize('sentiment', size, latencies, elapsed, size)
+
+def bench_sentiment_chunked(size: int, token_budget: int = 200, max_chunks: int = 16) -> Dict:
+    """
+    Scores `size` long articles one by one with the chunked content scorer,
+    whose per-article cost is capped by `max_chunks`.
+    """
+    from scoring import score_chunked
+
+    latencies = []
+    started = time.perf_counter()
+    for text in synthetic_texts(size, sentences=400):
+        _, seconds = timed(score_chunked, [text], token_budget, max_chunks)
+        latencies.append(seconds)
+    elapsed = time.perf_counter() - started
+    return summarize('sentiment[chunked]', size, latencies, elapsed, size)
+
+def bench_bothplot(size: int, tickers: int = 10, repeats: int = 5) -> Dict:
+    """
+    bothplot data prep (time-of-day axis, bar alignment, lead/lag) for `size` articles.
+    """
+    from alignment import align_sentiment_and_price, lead_lag_correlation, time_of_day
+
+    rng = np.random.default_rng(size)
+    names = [f"T{number}" for number in range(tickers)]
+    start = pd.Timestamp('2024-01-02 09:30')
+    sentiment_df = pd.DataFrame({
+        'Ticker': rng.choice(names, size),
+        'Date': start + pd.to_timedelta(rng.integers(0, 6.5 * 3600, size), unit='s'),
+        'Combined_Sentiment': rng.uniform(-1, 1, size),
+    })
+    snapshots = pd.date_range(start, periods=27, freq='15min')
+    price_df = pd.DataFrame({
+        'Ticker': np.repeat(names, len(snapshots)),
+        'Exported_At': np.tile(snapshots, tickers),
+        'Price': 100 + rng.normal(size=tickers * len(snapshots)).cumsum(),
+    })
+
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(repeats):
+        operation_started = time.perf_counter()
+        sentiment_df['Time_Datetime'] = time_of_day(sentiment_df['Date'])
+        price_df['Time_Datetime'] = time_of_day(price_df['Exported_At'])
+        bars = align_sentiment_and_price(sentiment_df, price_df)
+        lead_lag_correlation(bars, lags=range(0, 5))
+        latencies.append(time.perf_counter() - operation_started)
+    elapsed = time.perf_counter() - started
+    return summarize('bothplot', size, latencies, elapsed, size * repeats)
+
+def git_commit() -> str:
+    """
+    Returns the current commit hash, or 'unknown' outside a git checkout.
+    """
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=REPO_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def compare(previous_path: str, results: List[Dict]):
+    """
+    Prints the throughput and p99 change of every (stage, size) against a previous results file.
+    """
+    with open(previous_path, 'r', encoding='utf-8') as file:
+        previous = {(r['stage'], r['size']): r for r in json.load(file)['results']}
+    print(f"\nCompared with {previous_path}:")
+    for result in results:
+        old = previous.get((result['stage'], result['size']))
+        if old is None or not old.get('throughput_per_second') or not old.get('p99_ms'):
+            continue
+        throughput_change = result['throughput_per_second'] / old['throughput_per_second'] - 1
+        p99_change = result['p99_ms'] / old['p99_ms'] - 1
+        print(f"  {result['stage']:>10} {result['size']:>6}: throughput {throughput_change:+.1%}, p99 {p99_change:+.1%}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the export, fetch, sentiment and bothplot stages.")
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES)
+    parser.add_argument('--sizes', nargs='+', type=int, default=DEFAULT_SIZES)
+    parser.add_argument('--latency-ms', type=float, default=5.0, help="Simulated server latency per request")
+    parser.add_argument('--article-bytes', type=int, default=20000, help="Size of the synthetic article pages")
+    parser.add_argument('--corpus-dir', help="Directory of saved .html pages to use for the extract stage")
+    parser.add_argument('--output', help="Results file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument('--compare', help="Previous results file to compare against")
+    args = parser.parse_args()
+
+    results = []
+    with StandInServer(latency_ms=args.latency_ms, article_bytes=args.article_bytes) as stand_in, \
+            tempfile.TemporaryDirectory() as work_dir:
+        for stage in args.stages:
+            for size in args.sizes:
+                try:
+                    if stage == 'export':
+                        stage_results = [bench_export(stand_in.base_url, size, work_dir)]
+                    elif stage == 'fetch':
+                        stage_results = [bench_fetch(stand_in.base_url, size, args.article_bytes)]
+                    elif stage == 'extract':
+                        # Report the lxml engine and the html.parser fallback side by side
+                        pages = load_corpus(size, args.article_bytes, args.corpus_dir)
+                        stage_results = [bench_extract(pages, 'html.parser'), bench_extract(pages, 'lxml')]
+                    elif stage == 'sentiment':
+                        stage_results = [bench_sentiment(size), bench_sentiment_chunked(size)]
+                    else:
+                        stage_results = [bench_bothplot(size)]
+                except Exception as e:
+                    print(f"{stage} {size}: failed ({e})")
+                    continue
+                for result in stage_results:
+                    results.append(result)
+                    print(f"{result['stage']:>10} {size:>6}: {result['throughput_per_second']}/s, "
+                          f"p50 {result['p50_ms']} ms, p99 {result['p99_ms']} ms")
+
+    commit = git_commit()
+    report = {
+        'commit': commit,
+        'created_at': datetime.datetime.now().isoformat(timespec='seconds'),
+        'settings': {'latency_ms': args.latency_ms, 'article_bytes': args.article_bytes},
+        'results': results,
+    }
+    if args.compare:
+        compare(args.compare, results)
+    output_path = args.output or os.path.join(REPO_DIR, 'benchmarks', 'results', f"{commit[:12]}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as file:
+        json.dump(report, file, indent=2)
+    print(f"Results saved to {output_path}")
+
+if __name__ == "__main__":
+    main()
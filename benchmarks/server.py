@@ -0,0 +1,137 @@
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# Text blocks used to build synthetic articles
+ARTICLE_SENTENCES = [
+    "Shares rose after the company reported stronger than expected quarterly earnings.",
+    "Analysts warned that slowing demand could weigh on margins next year.",
+    "The board approved a new buyback program and raised the dividend.",
+    "Revenue declined as supply chain disruptions hit deliveries.",
+    "Investors welcomed the upbeat guidance for the coming quarter.",
+    "Regulators opened an investigation into the firm's accounting practices.",
+]
+BOILERPLATE = (
+    '<header><nav><a href="/">Home</a> <a href="/markets">Markets</a></nav></header>'
+    '<div class="cookie-banner"><p>We use cookies to improve your experience. Accept all cookies?</p></div>'
+)
+FOOTER = '<footer><p>Copyright 2024 Example Publisher. All rights reserved.</p><p>Terms | Privacy</p></footer>'
+
+def build_article(article_id: int, size_bytes: int) -> bytes:
+    """
+    Builds an HTML article of roughly `size_bytes`, with boilerplate around the body.
+    """
+    rng = random.Random(article_id)
+    paragraphs = []
+    length = 0
+    while length < size_bytes:
+        paragraph = ' '.join(rng.choice(ARTICLE_SENTENCES) for _ in range(5))
+        paragraphs.append(f"<p>{paragraph}</p>")
+        length += len(paragraph) + 7
+    body = ''.join(paragraphs)
+    # Related links and reader comments, as found around most real article bodies
+    related = ''.join(f"<p>Read next: {rng.choice(ARTICLE_SENTENCES)}</p>" for _ in range(10))
+    comments = ''.join(f"<p>Reader {number}: {rng.choice(ARTICLE_SENTENCES)}</p>" for number in range(len(paragraphs) // 2))
+    return (
+        f"<html><head><title>Article {article_id}</title><script>var tracking = {article_id};</script></head>"
+        f"<body>{BOILERPLATE}<article><h1>Article {article_id}</h1>{body}</article>"
+        f'<div class="related-articles">{related}</div><section class="comments">{comments}</section>'
+        f"{FOOTER}</body></html>"
+    ).encode('utf-8')
+
+def build_export_csv(tickers, seed: int) -> bytes:
+    """
+    Builds a synthetic Finviz export.ashx CSV snapshot for the given tickers.
+    """
+    rng = random.Random(seed)
+    rows = ['"No.","Ticker","Company","Sector","Price","Change","Volume"']
+    for number, ticker in enumerate(tickers, start=1):
+        price = 50 + (sum(map(ord, ticker)) % 400) + rng.uniform(-1, 1)
+        change = rng.uniform(-3, 3)
+        rows.append(f'"{number}","{ticker}","{ticker} Inc","Technology","{price:.2f}","{change:.2f}%","{rng.randint(1000, 10 ** 7)}"')
+    return ('\n'.join(rows) + '\n').encode('utf-8')
+
+class StandInServer:
+    def __init__(self, latency_ms: float = 0.0, article_bytes: int = 20000, host: str = '127.0.0.1', port: int = 0):
+        """
+        Local stand-in for Finviz's export.ashx and for publisher article pages.
+
+        Routes:
+            /export.ashx?t=AAA,BBB   synthetic price snapshot for the listed tickers
+            /article/<id>            synthetic article page
+
+        Both accept `latency_ms` and articles accept `size` (bytes) as query parameters,
+        overriding the server defaults.
+        """
+        self.latency_ms = latency_ms
+        self.article_bytes = article_bytes
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                server.requests += 1
+                parts = urlsplit(self.path)
+                query = parse_qs(parts.query)
+                latency = float(query.get('latency_ms', [server.latency_ms])[0])
+                if latency:
+                    time.sleep(latency / 1000)
+
+                if parts.path == '/export.ashx':
+                    tickers = [t for t in query.get('t', [''])[0].split(',') if t]
+                    body = build_export_csv(tickers, server.requests)
+                    content_type = 'text/csv'
+                elif parts.path.startswith('/article/'):
+                    article_id = int(parts.path.rsplit('/', 1)[1] or 0)
+                    body = build_article(article_id, int(query.get('size', [server.article_bytes])[0]))
+                    content_type = 'text/html; charset=utf-8'
+                else:
+                    self.send_response(404)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+if __name__ == "__main__":
+    with StandInServer(latency_ms=20) as stand_in:
+        print(f"Serving on {stand_in.base_url} (Ctrl+C to stop)")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
@@ -1,124 +1,127 @@
 import pandas as pd
-import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 import os
-import datetime
+from typing import Optional
+from alignment import align_sentiment_and_price, lead_lag_correlation, time_of_day
+from config import Config, load_config
+from history import history_files, load_prices, load_sentiment
+from storage import PartitionedStore
 
-# Define the directory containing the CSV files
-input_dir = os.path.expanduser(r"C:/Users/apspa/Documents/PSU/RESEARCH PROJECT/Code/outputs/")
+def draw_ticker_chart(fig, ticker: str, sentiment_df: pd.DataFrame, price_df: pd.DataFrame):
+    """
+    Draws a ticker's combined sentiment and stock price on a time-of-day axis into `fig`.
+
+    Args:
+        fig (matplotlib.figure.Figure): Empty figure to draw into, from pyplot or a headless canvas.
+        ticker (str): The ticker, used in labels and the title.
+        sentiment_df (pd.DataFrame): The ticker's articles with 'Time_Datetime' and 'Combined_Sentiment'.
+        price_df (pd.DataFrame): The ticker's snapshots with 'Time_Datetime' and 'Price'.
+    """
+    ax1 = fig.add_subplot()
+
+    # Plot sentiment data for the current ticker
+    ax1.plot(sentiment_df['Time_Datetime'], sentiment_df['Combined_Sentiment'], label=f"{ticker} Sentiment")
+
+    ax1.set_xlabel('Time')
+    ax1.set_ylabel('Combined Sentiment')
+    ax1.legend(loc='upper left')
+    ax1.grid(True)
+    ax1.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M:%S'))
+    ax1.xaxis.set_major_locator(mdates.HourLocator(interval=1))
+    ax1.tick_params(axis='x', labelrotation=45)
+
+    # Create a secondary y-axis for stock price
+    ax2 = ax1.twinx()
+
+    # Plot stock price data for the current ticker
+    ax2.plot(price_df['Time_Datetime'], price_df['Price'], label=f"{ticker} Price", linestyle='--')
+
+    ax2.set_ylabel('Stock Price')
+    ax2.legend(loc='upper right')
+
+    ax2.set_title(f'Combined Sentiment and Stock Price Over Time for {ticker}')
+    fig.tight_layout()
 
-def plot_combined_sentiment_and_price(sentiment_file_paths, price_file_paths):
+def plot_combined_sentiment_and_price(sentiment_file_paths, price_file_paths, tickers=None, start=None, end=None,
+                                      store: Optional[PartitionedStore] = None):
     """
     Plots combined sentiment scores and stock prices over time for multiple tickers.
     
     Args:
         sentiment_file_paths (list of str): List of file paths for sentiment CSV files.
         price_file_paths (list of str): List of file paths for price CSV files.
+        tickers (list of str, optional): Tickers to plot. All tickers of the files if None.
+        start (pd.Timestamp, optional): Earliest time to load.
+        end (pd.Timestamp, optional): Latest time to load.
+        store (PartitionedStore, optional): Parquet store read instead of the CSVs when it holds data.
     """
-    # List to store DataFrames for sentiment
-    sentiment_dfs = []
-
-    for file_path in sentiment_file_paths:
-        try:
-            # Read sentiment data into DataFrame
-            df = pd.read_csv(file_path)
-            print(f"Columns in sentiment file {file_path}: {df.columns}")
-            print(df.head())
-            
-            # Convert 'Date' to datetime
-            df['Date'] = pd.to_datetime(df['Date'], format='%Y-%m-%d %H:%M:%S')
-            df = df.dropna(subset=['Date'])
-            
-            # Extract time and create a Time_Datetime column
-            df['Time'] = df['Date'].dt.time
-            df['Time_Datetime'] = df.apply(lambda row: datetime.datetime.combine(datetime.date(1900, 1, 1), row['Time']), axis=1)
-            
-            # Add a column for the stock ticker
-            df['Ticker'] = os.path.basename(file_path).split('_')[0]
-            
-            sentiment_dfs.append(df)
-        except Exception as e:
-            print(f"Error processing sentiment file {file_path}: {e}")
-
-    if not sentiment_dfs:
+    # Load only the needed columns, tickers and dates, in chunks, with categorical tickers and float32 values
+    combined_sentiment_df = load_sentiment(sentiment_file_paths, tickers, start, end, store)
+    print(f"Loaded {len(combined_sentiment_df)} articles "
+          f"({combined_sentiment_df.memory_usage(deep=True).sum() / 1024:.0f} KiB)")
+    if combined_sentiment_df.empty:
         print("Error: No sentiment data found across all files.")
         return
 
-    # Combine all sentiment data into a single DataFrame and sort by Time_Datetime
-    combined_sentiment_df = pd.concat(sentiment_dfs).sort_values('Time_Datetime')
-
-    # List to store DataFrames for stock prices
-    price_dfs = []
-
-    for file_path in price_file_paths:
-        try:
-            # Read price data into DataFrame
-            df = pd.read_csv(file_path)
-            print(f"Columns in price file {file_path}: {df.columns}")
-            print(df.head())
-            
-            # Convert 'Exported_At' to datetime
-            df['Exported_At'] = pd.to_datetime(df['Exported_At'], format='%Y-%m-%d %H:%M:%S.%f')
-            df = df.dropna(subset=['Exported_At'])
-            
-            # Extract time and create a Time_Datetime column
-            df['Time'] = df['Exported_At'].dt.time
-            df['Time_Datetime'] = df.apply(lambda row: datetime.datetime.combine(datetime.date(1900, 1, 1), row['Time']), axis=1)
-            
-            # Add a column for the stock ticker
-            df['Ticker'] = df['Ticker']
-            
-            price_dfs.append(df)
-        except Exception as e:
-            print(f"Error processing price file {file_path}: {e}")
-
-    if not price_dfs:
+    # Extract time and create a Time_Datetime column, then sort by it
+    combined_sentiment_df['Time_Datetime'] = time_of_day(combined_sentiment_df['Date'])
+    combined_sentiment_df = combined_sentiment_df.sort_values('Time_Datetime')
+
+    combined_price_df = load_prices(price_file_paths, tickers, start, end, store)
+    print(f"Loaded {len(combined_price_df)} price snapshots "
+          f"({combined_price_df.memory_usage(deep=True).sum() / 1024:.0f} KiB)")
+    if combined_price_df.empty:
         print("Error: No price data found across all files.")
         return
 
-    # Combine all price data into a single DataFrame and sort by Time_Datetime
-    combined_price_df = pd.concat(price_dfs).sort_values('Time_Datetime')
-
-    # Create individual plots for each ticker
-    tickers = combined_sentiment_df['Ticker'].unique()
+    # Extract time and create a Time_Datetime column, then sort by it
+    combined_price_df['Time_Datetime'] = time_of_day(combined_price_df['Exported_At'])
+    combined_price_df = combined_price_df.sort_values('Time_Datetime')
 
-    for ticker in tickers:
-        fig, ax1 = plt.subplots(figsize=(12, 6))
+    # Align sentiment and prices into 15 minute bars and report how sentiment leads returns
+    bars = align_sentiment_and_price(combined_sentiment_df, combined_price_df, freq='15min')
+    print("Correlation of bar sentiment with returns N bars later:")
+    print(lead_lag_correlation(bars, lags=range(0, 5)))
 
-        # Plot sentiment data for the current ticker
-        ticker_sentiment_df = combined_sentiment_df[combined_sentiment_df['Ticker'] == ticker]
-        ax1.plot(ticker_sentiment_df['Time_Datetime'], ticker_sentiment_df['Combined_Sentiment'], label=f"{ticker} Sentiment")
+    # pyplot picks a GUI backend on import, so it is only loaded here; render.py draws without it
+    import matplotlib.pyplot as plt
 
-        ax1.set_xlabel('Time')
-        ax1.set_ylabel('Combined Sentiment')
-        ax1.legend(loc='upper left')
-        ax1.grid(True)
-        ax1.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M:%S'))
-        ax1.xaxis.set_major_locator(mdates.HourLocator(interval=1))
-        plt.xticks(rotation=45)
+    # Split both frames by ticker once instead of filtering them for every ticker
+    sentiment_by_ticker = dict(tuple(combined_sentiment_df.groupby('Ticker', observed=True)))
+    price_by_ticker = dict(tuple(combined_price_df.groupby('Ticker', observed=True)))
+    empty_price_df = combined_price_df.iloc[0:0]
 
-        # Create a secondary y-axis for stock price
-        ax2 = ax1.twinx()
-
-        # Plot stock price data for the current ticker
-        ticker_price_df = combined_price_df[combined_price_df['Ticker'] == ticker]
-        ax2.plot(ticker_price_df['Time_Datetime'], ticker_price_df['Price'], label=f"{ticker} Price", linestyle='--')
+    # Create individual plots for each ticker
+    for ticker, ticker_sentiment_df in sentiment_by_ticker.items():
+        fig = plt.figure(figsize=(12, 6))
+        draw_ticker_chart(fig, ticker, ticker_sentiment_df, price_by_ticker.get(ticker, empty_price_df))
+        plt.show()
 
-        ax2.set_ylabel('Stock Price')
-        ax2.legend(loc='upper right')
+def main(config: Optional[Config] = None, start: Optional[str] = None, end: Optional[str] = None,
+         use_store: bool = False):
+    """
+    Plots sentiment and prices of every configured ticker from the output directory.
 
-        plt.title(f'Combined Sentiment and Stock Price Over Time for {ticker}')
-        plt.tight_layout()
+    Args:
+        config (Config, optional): Directories and tickers. Loaded with `load_config` if None.
+        start (str, optional): Earliest time to plot.
+        end (str, optional): Latest time to plot.
+        use_store (bool): Read the Parquet store instead of the CSVs.
+    """
+    config = config or load_config()
+    universe = config.universe()
 
-        plt.show()
+    # List of sentiment CSV file paths, including the days archived by maintenance
+    sentiment_file_paths = [path for ticker in universe
+                            for path in history_files(config.output_dir, f'{ticker}_today_news_with_sentiment.csv',
+                                                      start, end)]
 
-# List of sentiment CSV file paths
-sentiment_file_paths = [os.path.join(input_dir, 'AMZN_today_news_with_sentiment.csv'),
-                        os.path.join(input_dir, 'AAPL_today_news_with_sentiment.csv'),
-                        os.path.join(input_dir, 'GOOGL_today_news_with_sentiment.csv')]
+    # List of price CSV file paths
+    price_file_paths = history_files(config.output_dir, os.path.basename(config.export_file_path), start, end)
 
-# List of price CSV file paths
-price_file_paths = [os.path.join(input_dir, 'export.csv')]
+    # Generate the plot
+    store = PartitionedStore(config.store_dir) if use_store else None
+    plot_combined_sentiment_and_price(sentiment_file_paths, price_file_paths, universe, start, end, store)
 
-# Generate the plot
-plot_combined_sentiment_and_price(sentiment_file_paths, price_file_paths)
+if __name__ == "__main__":
+    main()
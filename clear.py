@@ -1,7 +1,33 @@
+import datetime
+import gzip
 import os
+import shutil
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from article_cache import ArticleCache
+from config import load_config
+from get_news import NEWS_INDEX_FILENAME, news_key
+from history import ARCHIVE_DIR_NAME, archive_dir
+from processed_index import ProcessedIndex
+from scoring import ScoreCache
+from storage import PartitionedStore
+# Rows read from a working file at a time during compaction
+COMPACT_CHUNKSIZE = 100000
+# Scores kept in the on-disk score cache; older ones are scored again if their text comes back
+SCORE_CACHE_MAX_ENTRIES = 500000
+# Datasets of the Parquet store: the columns identifying a row (as in `file_layout`, plus the ticker,
+# since the store holds every ticker) and the column rows are sorted by when compacted
+STORE_LAYOUTS = {
+    'export': (['Ticker', 'Exported_At'], 'Exported_At'),
+    'news': (['Ticker', 'Link'], 'Date'),
+    'sentiment': (['Ticker', 'Link'], 'Date'),
+    'sentiment_chunks': (['Ticker', 'Link', 'Chunk'], 'Date'),
+}
 
 def clear_all_csv_files(directory_path: str):
-    """ Clears the content of all CSV files in the specified directory. """
+    """ Clears the content of all CSV files in the specified directory, and the link indexes describing them. """
     # Check if the specified directory exists
     if os.path.exists(directory_path):
         # Iterate through all files in the directory
@@ -15,12 +41,235 @@ def clear_all_csv_files(directory_path: str):
                     file.write('')  # Clear the content of the file
                 # Print a confirmation message
                 print(f"File {file_path} has been cleared.")
+            # Remove the indexes of the rows just cleared, so their articles are collected and scored again
+            elif filename.endswith('.links') or filename == NEWS_INDEX_FILENAME:
+                os.remove(os.path.join(directory_path, filename))
+                print(f"Index {filename} has been removed.")
     else:
         # Print an error message if the directory does not exist
         print(f"Directory {directory_path} does not exist.")
 
-# Define the path to the directory containing the CSV files
-csv_directory = os.path.expanduser(r"/Users/apspa/Documents/PSU/RESEARCH PROJECT/Code/outputs")
+def file_layout(filename: str) -> Optional[Tuple[List[str], str]]:
+    """
+    Returns the duplicate key columns and the time column of a working CSV, or None for other files.
+    News and sentiment files hold a single ticker, so their key is the link alone.
+    """
+    if filename == 'export.csv':
+        return ['Ticker', 'Exported_At'], 'Exported_At'
+    if filename.endswith('_today_news.csv') or filename.endswith('_today_news_with_sentiment.csv'):
+        return ['Link'], 'Date'
+    return None
+
+def _write_gzip_csv(df: pd.DataFrame, path: str):
+    # Written under a temporary name so a crash never leaves a truncated archive
+    with gzip.open(f"{path}.tmp", 'wt', encoding='utf-8', newline='') as file:
+        df.to_csv(file, index=False)
+    os.replace(f"{path}.tmp", path)
+
+def compact_csv(csv_path: str, archive_dir: str, key_columns: List[str], time_column: str,
+                today: Optional[datetime.date] = None, chunksize: int = COMPACT_CHUNKSIZE) -> Dict[str, int]:
+    """
+    Removes duplicate rows from an append-only CSV and moves the rows of closed days to
+    `<archive_dir>/<YYYY-MM-DD>.csv.gz`. Only rows of today (and rows without a readable time)
+    stay in the working file, so it stays small while every day remains on disk.
+
+    Values are copied as text, so kept rows are written back exactly as they were read.
+    Run it while no script is appending to the file, e.g. from cron before the market opens.
+
+    Args:
+        csv_path (str): The working CSV.
+        archive_dir (str): Directory of the file's daily archives.
+        key_columns (List[str]): Columns identifying a row; later copies of a key are dropped.
+        time_column (str): Column whose date decides the day of a row.
+        today (datetime.date, optional): First day that is still open. Defaults to today.
+        chunksize (int): Rows read at a time.
+
+    Returns:
+        Dict[str, int]: Number of rows 'kept', 'archived' and 'duplicates' removed.
+    """
+    counts = {'kept': 0, 'archived': 0, 'duplicates': 0}
+    if not os.path.exists(csv_path) or os.path.getsize(csv_path) == 0:
+        return counts
+    today = pd.Timestamp(today or datetime.date.today())
+    os.makedirs(archive_dir, exist_ok=True)
+
+    # Staged rows of a previous run that stopped early are still in the working file
+    for name in os.listdir(archive_dir):
+        if name.endswith('.part'):
+            os.remove(os.path.join(archive_dir, name))
+
+    seen = set()
+    staged_days = set()
+    working_tmp = f"{csv_path}.tmp"
+    with pd.read_csv(csv_path, dtype=str, keep_default_na=False, chunksize=chunksize) as reader, \
+            open(working_tmp, 'w', encoding='utf-8', newline='') as working:
+        for number, chunk in enumerate(reader):
+            if number == 0:
+                # Keep the header even if every row is archived
+                chunk.iloc[0:0].to_csv(working, index=False)
+
+            # Drop rows whose key was already seen in this file
+            keys = pd.Series(list(zip(*(chunk[column] for column in key_columns))), index=chunk.index)
+            duplicated = keys.duplicated() | keys.isin(seen)
+            seen.update(keys[~duplicated])
+            counts['duplicates'] += int(duplicated.sum())
+            chunk = chunk[~duplicated]
+
+            days = pd.to_datetime(chunk[time_column], format='mixed', errors='coerce').dt.normalize()
+            closed = days.notna() & (days < today)
+            chunk[~closed].to_csv(working, header=False, index=False)
+            counts['kept'] += int((~closed).sum())
+
+            # Stage closed days uncompressed first; they are merged into the archives below
+            for day, day_df in chunk[closed].groupby(days[closed].dt.strftime('%Y-%m-%d')):
+                part_path = os.path.join(archive_dir, f"{day}.csv.part")
+                day_df.to_csv(part_path, mode='a', header=day not in staged_days, index=False)
+                staged_days.add(day)
+                counts['archived'] += len(day_df)
+
+    # Merge the staged rows into each day's archive, dropping rows the archive already holds
+    for day in sorted(staged_days):
+        archive_path = os.path.join(archive_dir, f"{day}.csv.gz")
+        part_path = os.path.join(archive_dir, f"{day}.csv.part")
+        day_df = pd.read_csv(part_path, dtype=str, keep_default_na=False)
+        if os.path.exists(archive_path):
+            archived_df = pd.read_csv(archive_path, dtype=str, keep_default_na=False)
+            day_df = pd.concat([archived_df, day_df], ignore_index=True).drop_duplicates(subset=key_columns)
+        _write_gzip_csv(day_df, archive_path)
+        os.remove(part_path)
+
+    # Swap in the compacted working file only once every archived row is safely written
+    os.replace(working_tmp, csv_path)
+    return counts
+
+def _working_links(csv_path: str) -> set:
+    if not os.path.exists(csv_path) or os.path.getsize(csv_path) == 0:
+        return set()
+    return set(pd.read_csv(csv_path, usecols=['Link'], dtype=str)['Link'].dropna())
+
+def prune_indexes(directory_path: str) -> int:
+    """
+    Removes link index entries whose rows are no longer in the working CSVs.
+
+    The indexes are only checked against rows that can still be appended or scored: get_news.py
+    keeps today's headlines only, and analyze_news.py and the pipeline read the working news CSVs.
+    Run it right after compaction, which leaves only today's rows in the working files, so the
+    indexes (loaded whole by every run) stay as small as the files they describe.
+
+    Returns:
+        int: Number of index entries removed.
+    """
+    removed = 0
+    news_index_path = os.path.join(directory_path, NEWS_INDEX_FILENAME)
+    if os.path.exists(news_index_path):
+        suffix = '_today_news.csv'
+        keep = {news_key(filename[:-len(suffix)], link)
+                for filename in os.listdir(directory_path) if filename.endswith(suffix)
+                for link in _working_links(os.path.join(directory_path, filename))}
+        removed += ProcessedIndex(news_index_path).retain(keep.__contains__)
+
+    for filename in os.listdir(directory_path):
+        if filename.endswith('_with_sentiment.links'):
+            keep = _working_links(os.path.join(directory_path, f"{os.path.splitext(filename)[0]}.csv"))
+            removed += ProcessedIndex(os.path.join(directory_path, filename)).retain(keep.__contains__)
+    return removed
+
+def trim_caches(directory_path: str) -> int:
+    """
+    Keeps the article cache within its size and age limits and the score cache within
+    SCORE_CACHE_MAX_ENTRIES. Caches that were never created are left alone.
+
+    Returns:
+        int: Number of cache entries removed.
+    """
+    removed = 0
+    article_cache_path = os.path.join(directory_path, 'article_cache.sqlite')
+    if os.path.exists(article_cache_path):
+        article_cache = ArticleCache(article_cache_path)
+        removed += article_cache.evict()
+        article_cache.close()
+    score_cache_path = os.path.join(directory_path, 'score_cache.sqlite')
+    if os.path.exists(score_cache_path):
+        score_cache = ScoreCache(score_cache_path)
+        removed += score_cache.trim(SCORE_CACHE_MAX_ENTRIES)
+        score_cache.close()
+    return removed
+
+def apply_retention(output_dir: str, retention_days: float, today: Optional[datetime.date] = None) -> int:
+    """
+    Deletes archived days and Parquet store partitions older than `retention_days`.
+
+    Returns:
+        int: Number of day archives and store partitions removed.
+    """
+    cutoff = (pd.Timestamp(today or datetime.date.today()) - pd.Timedelta(days=retention_days)).strftime('%Y-%m-%d')
+    removed = 0
+
+    archive_root = os.path.join(output_dir, ARCHIVE_DIR_NAME)
+    if os.path.isdir(archive_root):
+        for stem in os.listdir(archive_root):
+            for name in os.listdir(os.path.join(archive_root, stem)):
+                if name.endswith('.csv.gz') and name[:len('YYYY-MM-DD')] < cutoff:
+                    os.remove(os.path.join(archive_root, stem, name))
+                    removed += 1
+
+    # Partitions of the store are `<dataset>/date=YYYY-MM-DD/`
+    store_root = os.path.join(output_dir, "store")
+    if os.path.isdir(store_root):
+        for dataset in os.listdir(store_root):
+            dataset_dir = os.path.join(store_root, dataset)
+            if not os.path.isdir(dataset_dir):
+                continue
+            for date_dir in os.listdir(dataset_dir):
+                if date_dir.startswith('date=') and date_dir.partition('=')[2] < cutoff:
+                    shutil.rmtree(os.path.join(dataset_dir, date_dir))
+                    removed += 1
+    return removed
+
+def maintain_directory(directory_path: str, retention_days: Optional[float] = None,
+                       today: Optional[datetime.date] = None):
+    """
+    Compacts every news, sentiment and export CSV of a directory, archives their closed days,
+    prunes the link indexes to the rows left in the working files, trims the article and score
+    caches, merges the files of the store's closed days, then deletes history older than
+    `retention_days` (history is kept forever if None).
+    """
+    if not os.path.exists(directory_path):
+        print(f"Directory {directory_path} does not exist.")
+        return
+    for filename in sorted(os.listdir(directory_path)):
+        layout = file_layout(filename)
+        if layout is None:
+            continue
+        key_columns, time_column = layout
+        counts = compact_csv(os.path.join(directory_path, filename), archive_dir(directory_path, filename),
+                             key_columns, time_column, today)
+        print(f"{filename}: {counts['kept']} rows kept, {counts['archived']} archived, "
+              f"{counts['duplicates']} duplicates removed")
+
+    # Keep the indexes and caches every run loads or queries as small as the working files
+    print(f"Removed {prune_indexes(directory_path)} link index entries of archived rows")
+    print(f"Removed {trim_caches(directory_path)} cache entries")
+
+    # Merge the many small files appended to each closed day of the store into one per day
+    store_root = os.path.join(directory_path, "store")
+    if os.path.isdir(store_root):
+        store = PartitionedStore(store_root)
+        for dataset, (key_columns, time_column) in STORE_LAYOUTS.items():
+            merged = store.compact(dataset, time_column, key_columns, before=today or datetime.date.today())
+            if merged:
+                print(f"store/{dataset}: compacted {merged} files into their day partitions")
+
+    if retention_days is not None:
+        removed = apply_retention(directory_path, retention_days, today)
+        print(f"Removed {removed} archived days and store partitions older than {retention_days} days")
+
+def main():
+    """
+    Compacts and archives the CSV files of the configured output directory.
+    """
+    config = load_config()
+    maintain_directory(config.output_dir, config.retention_days)
 
-# Call the function to clear all CSV files in the directory
-clear_all_csv_files(csv_directory)
+if __name__ == "__main__":
+    main()
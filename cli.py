@@ -0,0 +1,169 @@
+import argparse
+import sys
+from typing import List, Optional
+
+from config import Config, load_config
+
+# Every subcommand imports its module inside its handler, so `export` never loads the GUI
+# stack and `fetch-news` never loads finvader; only config.py is imported up front.
+
+def run_fetch_news(config: Config, args: argparse.Namespace):
+    import get_news
+
+    get_news.main(config, max_workers=args.workers, min_interval=args.min_interval)
+
+def run_export(config: Config, args: argparse.Namespace):
+    import export
+
+    export.main(config, market_hours_only=args.market_hours_only, live_plot=args.live_plot, once=args.once)
+
+def run_analyze(config: Config, args: argparse.Namespace):
+    import analyze_news
+
+    analyze_news.main(config, input_dir=args.input_dir)
+
+def run_pipeline(config: Config, args: argparse.Namespace):
+    import pipeline
+
+    pipeline.main(config, duration_seconds=args.duration, once=args.once)
+
+def run_sentiment(config: Config, args: argparse.Namespace):
+    import os
+    from aggregates import SentimentAggregates, rebuild_from_csv
+    from history import history_files
+
+    aggregates = SentimentAggregates(os.path.join(config.output_dir, 'sentiment_aggregates.sqlite'))
+    try:
+        for ticker in args.ticker or config.universe():
+            if args.rebuild:
+                # Archived days are read along with the working file, or a rebuild would lose them
+                csv_paths = history_files(config.output_dir, f"{ticker}_today_news_with_sentiment.csv")
+                print(f"Rebuilt {ticker} from {rebuild_from_csv(aggregates, ticker, csv_paths)} articles")
+            if args.start or args.end:
+                print(f"{ticker}:")
+                print(aggregates.range(ticker, args.resolution, args.start, args.end).to_string(index=False))
+            else:
+                latest = aggregates.latest(ticker, args.resolution)
+                if latest is None:
+                    print(f"{ticker}: no articles")
+                    continue
+                print(f"{ticker}: " + ', '.join(f"{name}={value:.4f}" if isinstance(value, float) else f"{name}={value}"
+                                                for name, value in latest.items()))
+    finally:
+        aggregates.close()
+
+def run_plot(config: Config, args: argparse.Namespace):
+    if args.chart == 'prices':
+        import plotter
+
+        plotter.show_plot(config.export_file_path, live=args.live)
+    else:
+        import bothplot
+
+        bothplot.main(config, start=args.start, end=args.end, use_store=args.from_store)
+
+def run_render(config: Config, args: argparse.Namespace):
+    import render
+
+    render.main(config, chart_format=args.format, start=args.start, end=args.end, charts_dir=args.charts_dir,
+                max_workers=args.workers, force=args.force)
+
+def run_maintain(config: Config, args: argparse.Namespace):
+    import clear
+
+    if args.truncate:
+        clear.clear_all_csv_files(config.output_dir)
+        return
+    retention_days = args.retention_days if args.retention_days is not None else config.retention_days
+    clear.maintain_directory(config.output_dir, retention_days)
+
+def build_parser() -> argparse.ArgumentParser:
+    """
+    Builds the argument parser with one subcommand per script.
+    """
+    parser = argparse.ArgumentParser(description="Finviz news sentiment and price collection.")
+    parser.add_argument('--config', help="JSON config file (default: $FINVIZ_CONFIG or ./config.json)")
+    parser.add_argument('--output-dir', help="Directory of the CSV files, stores and metrics")
+    parser.add_argument('--tickers', help="Comma-separated tickers, overriding the config and tickers file")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    fetch_news = subparsers.add_parser('fetch-news', help="Append today's new headlines for every ticker")
+    fetch_news.add_argument('--workers', type=int, default=8, help="Tickers fetched at the same time")
+    fetch_news.add_argument('--min-interval', type=float, default=0.5, help="Seconds between two Finviz requests")
+    fetch_news.set_defaults(handler=run_fetch_news)
+
+    export = subparsers.add_parser('export', help="Poll price snapshots (headless unless --live-plot)")
+    export.add_argument('--interval', type=float, help="Minutes between snapshots")
+    export.add_argument('--duration', type=float, help="Minutes to keep polling")
+    export.add_argument('--market-hours-only', action='store_true', help="Only poll during the regular session")
+    export.add_argument('--once', action='store_true', help="Fetch a single snapshot and exit (for cron)")
+    export.add_argument('--live-plot', action='store_true', help="Show the live price window while polling")
+    export.set_defaults(handler=run_export)
+
+    analyze = subparsers.add_parser('analyze', help="Score new articles of every news CSV")
+    analyze.add_argument('--input-dir', help="Directory of the news CSVs (default: the output directory)")
+    analyze.set_defaults(handler=run_analyze)
+
+    pipeline = subparsers.add_parser('pipeline', help="Run the streaming discover/fetch/score/store pipeline")
+    pipeline.add_argument('--duration', type=float, help="Seconds to keep discovering (default: until interrupted)")
+    pipeline.add_argument('--once', action='store_true', help="Make a single discovery pass, then stop")
+    pipeline.set_defaults(handler=run_pipeline)
+
+    sentiment = subparsers.add_parser('sentiment', help="Show the latest or a range of sentiment aggregates")
+    sentiment.add_argument('ticker', nargs='*', help="Tickers to show (default: the universe)")
+    sentiment.add_argument('--resolution', default='15min', choices=['1min', '15min', '1D'], help="Bucket size")
+    sentiment.add_argument('--start', help="Show the buckets from this time on instead of the latest one")
+    sentiment.add_argument('--end', help="Show the buckets up to this time")
+    sentiment.add_argument('--rebuild', action='store_true', help="Rebuild the aggregates from the sentiment CSVs first")
+    sentiment.set_defaults(handler=run_sentiment)
+
+    plot = subparsers.add_parser('plot', help="Plot prices, or sentiment against prices")
+    plot.add_argument('chart', choices=['prices', 'sentiment'], help="Chart to show")
+    plot.add_argument('--live', action='store_true', help="Keep extending the price chart as rows arrive")
+    plot.add_argument('--start', help="Earliest time to plot (sentiment chart)")
+    plot.add_argument('--end', help="Latest time to plot (sentiment chart)")
+    plot.add_argument('--from-store', action='store_true', help="Read the Parquet store instead of the CSVs (sentiment chart)")
+    plot.set_defaults(handler=run_plot)
+
+    render = subparsers.add_parser('render', help="Save sentiment/price charts of tickers with new data as image files")
+    render.add_argument('--format', choices=['png', 'svg'], default='png', help="Image format (default: png)")
+    render.add_argument('--start', help="Earliest time to draw")
+    render.add_argument('--end', help="Latest time to draw")
+    render.add_argument('--charts-dir', help="Directory of the charts (default: <output-dir>/charts)")
+    render.add_argument('--workers', type=int, help="Rendering processes (default: number of CPUs)")
+    render.add_argument('--force', action='store_true', help="Render every ticker even if its data is unchanged")
+    render.set_defaults(handler=run_render)
+
+    # `clear` is the subcommand's earlier name and is kept for existing scripts and cron jobs
+    maintain = subparsers.add_parser('maintain', aliases=['clear'],
+                                     help="Deduplicate the CSVs, archive closed days and apply retention")
+    maintain.add_argument('--retention-days', type=float, help="Delete archived days older than this (default: config)")
+    maintain.add_argument('--truncate', action='store_true', help="Empty every CSV file instead, discarding all history")
+    maintain.set_defaults(handler=run_maintain)
+    return parser
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Parses the command line, applies it on top of the config, and runs the subcommand.
+    """
+    args = build_parser().parse_args(argv)
+    config = load_config(args.config)
+    # Command-line options take precedence over the config file and the environment
+    if args.output_dir:
+        config.output_dir = args.output_dir
+    if args.tickers:
+        config.tickers = [ticker.strip().upper() for ticker in args.tickers.split(',') if ticker.strip()]
+    if getattr(args, 'interval', None) is not None:
+        config.interval_minutes = args.interval
+    if getattr(args, 'duration', None) is not None and args.command == 'export':
+        config.duration_minutes = args.duration
+
+    try:
+        args.handler(config, args)
+    except KeyboardInterrupt:
+        print("Interrupted")
+        return 130
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
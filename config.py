@@ -0,0 +1,113 @@
+import json
+import os
+from typing import List, Optional
+
+# Config file read when no path is given and FINVIZ_CONFIG is not set
+DEFAULT_CONFIG_PATH = "config.json"
+# Directory where CSV files, stores and metrics are saved
+DEFAULT_OUTPUT_DIR = "outputs"
+# Tickers used when neither the config nor a tickers file lists any
+DEFAULT_TICKERS = ['AMZN', 'AAPL', 'GOOGL']
+
+def load_tickers(path: str, default: Optional[List[str]] = None) -> List[str]:
+    """
+    Load the ticker universe from a text file.
+
+    Args:
+        path (str): File with tickers separated by newlines or commas; '#' starts a comment.
+        default (List[str], optional): Tickers returned if the file does not exist.
+
+    Returns:
+        List[str]: Unique upper-case tickers in file order.
+    """
+    if not os.path.exists(path):
+        return list(default or [])
+    loaded = []
+    with open(path, 'r', encoding='utf-8') as file:
+        for line in file:
+            line = line.split('#', 1)[0]
+            loaded.extend(ticker.strip().upper() for ticker in line.split(',') if ticker.strip())
+    return list(dict.fromkeys(loaded))
+
+class Config:
+    def __init__(self, output_dir: str = DEFAULT_OUTPUT_DIR, tickers: Optional[List[str]] = None,
+                 tickers_file: Optional[str] = None, auth_token: str = "",
+                 interval_minutes: float = 15, duration_minutes: float = 300, batch_size: int = 100,
+                 retention_days: Optional[float] = None):
+        """
+        Settings shared by all commands.
+
+        Args:
+            output_dir (str): Directory of the CSV files, stores and metrics.
+            tickers (List[str], optional): Ticker universe. Takes precedence over the tickers file.
+            tickers_file (str, optional): File listing the ticker universe, used when `tickers` is not set.
+                Defaults to `<output_dir>/tickers.txt`.
+            auth_token (str): FinViz Elite auth token for export.ashx.
+            interval_minutes (float): Spacing between two price snapshots.
+            duration_minutes (float): How long the export poller runs.
+            batch_size (int): Maximum number of tickers per export URL.
+            retention_days (float, optional): Archived days and store partitions older than this are
+                deleted by maintenance. History is kept forever if None.
+        """
+        self.output_dir = os.path.expanduser(output_dir)
+        self.tickers = list(tickers) if tickers else None
+        self._tickers_file = os.path.expanduser(tickers_file) if tickers_file else None
+        self.auth_token = auth_token
+        self.interval_minutes = interval_minutes
+        self.duration_minutes = duration_minutes
+        self.batch_size = batch_size
+        self.retention_days = retention_days
+
+    @property
+    def tickers_file(self) -> str:
+        return self._tickers_file or os.path.join(self.output_dir, "tickers.txt")
+
+    def universe(self) -> List[str]:
+        """
+        Returns the configured tickers, else those of the tickers file, else DEFAULT_TICKERS.
+        """
+        if self.tickers:
+            return list(self.tickers)
+        return load_tickers(self.tickers_file, default=DEFAULT_TICKERS)
+
+    @property
+    def export_file_path(self) -> str:
+        return os.path.join(self.output_dir, "export.csv")
+
+    @property
+    def store_dir(self) -> str:
+        return os.path.join(self.output_dir, "store")
+
+    @property
+    def metrics_dir(self) -> str:
+        return os.path.join(self.output_dir, "metrics")
+
+def load_config(path: Optional[str] = None) -> Config:
+    """
+    Load settings from a JSON file, then apply environment overrides.
+
+    The file is `path`, else $FINVIZ_CONFIG, else ./config.json if it exists. Its keys are the
+    arguments of `Config`. FINVIZ_OUTPUT_DIR, FINVIZ_TICKERS (comma-separated) and
+    FINVIZ_AUTH_TOKEN override the file.
+
+    Args:
+        path (str, optional): Path of the JSON config file.
+
+    Returns:
+        Config: The loaded settings.
+    """
+    path = path or os.environ.get('FINVIZ_CONFIG') or DEFAULT_CONFIG_PATH
+    settings = {}
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as file:
+            settings = json.load(file)
+    elif path != DEFAULT_CONFIG_PATH:
+        raise FileNotFoundError(f"Config file {path} does not exist")
+
+    if os.environ.get('FINVIZ_OUTPUT_DIR'):
+        settings['output_dir'] = os.environ['FINVIZ_OUTPUT_DIR']
+    if os.environ.get('FINVIZ_TICKERS'):
+        settings['tickers'] = [ticker.strip().upper() for ticker in os.environ['FINVIZ_TICKERS'].split(',') if ticker.strip()]
+    if os.environ.get('FINVIZ_AUTH_TOKEN'):
+        settings['auth_token'] = os.environ['FINVIZ_AUTH_TOKEN']
+    return Config(**settings)
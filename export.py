@@ -3,130 +3,290 @@ import requests
 import os
 import pandas as pd
 import io
+import math
+import threading
 import time
-from typing import List
-import sys
-from PyQt5.QtWidgets import QApplication, QMainWindow, QVBoxLayout, QWidget
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-
-# Define the URL to fetch the data from
-URL = "https://elite.finviz.com/export.ashx?v=111&t=AMZN,AAPL,GOOGL&auth=ab4e8b66-99af-4c54-b834-10d199e1e3d5"
-# Define the path where the exported data will be saved
-EXPORT_FILE_PATH = os.path.expanduser(r"/Users/apspa/Documents/PSU/RESEARCH PROJECT/Code/outputs/export.csv")
-# Ensure the directory exists
-os.makedirs(os.path.dirname(EXPORT_FILE_PATH), exist_ok=True)
-
-def export_data(url: str, output_path: str):
-    """
-    Fetches data from the provided URL and appends it to the specified output file.
-    If the file already exists, it concatenates the new data with the existing data.
-    """
-    response = requests.get(url)
-    if response.status_code == 200:
-        # Load the new data from the response
-        new_data = pd.read_csv(io.StringIO(response.text))
-        current_datetime = datetime.datetime.now()
-        new_data['Exported_At'] = current_datetime
-        
-        # Check if the output file already exists and is not empty
-        if os.path.exists(output_path) and os.path.getsize(output_path) > 0:
-            try:
-                existing_data = pd.read_csv(output_path)
-                combined_data = pd.concat([existing_data, new_data])
-            except pd.errors.EmptyDataError:
-                # If the file is empty or cannot be read, use only the new data
-                combined_data = new_data
-        else:
-            combined_data = new_data
-        
-        # Save the combined data to the output file
-        combined_data.to_csv(output_path, index=False)
-        print(f"Data successfully exported to {output_path}")
-    else:
-        print(f"Failed to fetch data: {response.status_code}")
-
-def export_data_repeatedly(url: str, output_path: str, duration_minutes: int, interval_minutes: int):
-    """
-    Repeatedly fetches and appends data to the output file at the specified interval.
-    Continues for the given duration in minutes.
-    """
-    start_time = time.time()
-    end_time = start_time + duration_minutes * 60
-    
-    while time.time() < end_time:
-        export_data(url, output_path)
-        time.sleep(interval_minutes * 60)  # Wait for the specified interval
-
-class StockPlotter(QMainWindow):
-    def __init__(self, csv_file: str):
-        """
-        Initializes the main window for plotting stock prices.
-        """
-        super().__init__()
-        self.setWindowTitle("Stock Price Plotter")
-        self.setGeometry(100, 100, 1200, 800)
-
-        # Create a central widget and set a layout
-        self.central_widget = QWidget()
-        self.setCentralWidget(self.central_widget)
-        self.layout = QVBoxLayout(self.central_widget)
-
-        # Create a matplotlib figure and axis
-        self.figure, self.ax = plt.subplots()
-        self.canvas = FigureCanvas(self.figure)
-        self.layout.addWidget(self.canvas)
-
-        # Plot the data from the CSV file
-        self.plot_data(csv_file)
-
-    def plot_data(self, csv_file: str):
-        """
-        Plots stock prices from the CSV file.
-        """
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Union
+from zoneinfo import ZoneInfo
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+from config import Config, load_config
+from storage import PartitionedStore
+import metrics
+
+# FinViz export endpoint the snapshot URLs are built from
+EXPORT_BASE_URL = "https://elite.finviz.com/export.ashx"
+# Exported_At is always written with microseconds so every row parses with the same format
+EXPORTED_AT_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+# Regular US market session, used to stop polling at the close
+MARKET_TIMEZONE = ZoneInfo("America/New_York")
+MARKET_OPEN = datetime.time(9, 30)
+MARKET_CLOSE = datetime.time(16, 0)
+# When each batch was actually fetched and how long it took; kept in the Parquet store only,
+# as the CSV's header is fixed by the files already written
+FETCH_TIMING_COLUMNS = ['Fetched_At', 'Fetch_Latency']
+
+def build_export_urls(tickers: List[str], auth_token: str, batch_size: int = 100,
+                      base_url: str = EXPORT_BASE_URL) -> List[str]:
+    """
+    Splits a ticker universe into export URLs of at most `batch_size` tickers each.
+    """
+    return [
+        f"{base_url}?v=111&t={','.join(tickers[start:start + batch_size])}&auth={auth_token}"
+        for start in range(0, len(tickers), batch_size)
+    ]
+
+def create_session(pool_size: int = 8) -> requests.Session:
+    """
+    Creates a session whose connection pool can serve `pool_size` concurrent requests.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def fetch_with_backoff(session: requests.Session, url: str, retries: int = 4, backoff_seconds: float = 1.0,
+                       timeout: float = 30.0) -> Optional[requests.Response]:
+    """
+    Fetches a URL, retrying with exponential backoff on errors and non-200 responses.
+    Returns None if every attempt failed.
+    """
+    host = urlsplit(url).netloc
+    for attempt in range(retries + 1):
         try:
-            # Load data from CSV file
-            df = pd.read_csv(csv_file)
-        except pd.errors.EmptyDataError:
-            print(f"Error: The file {csv_file} is empty or cannot be read.")
-            return
-
-        # Convert 'Exported_At' to datetime and drop rows with invalid dates
-        df['Exported_At'] = pd.to_datetime(df['Exported_At'], errors='coerce')
-        df = df.dropna(subset=['Exported_At'])  # Drop rows where 'Exported_At' is NaT
-
-        # Clear existing plots
-        self.ax.clear()
-
-        # Plot stock prices for each ticker
-        for ticker in df['Ticker'].unique():
-            ticker_df = df[df['Ticker'] == ticker]
-            self.ax.plot(ticker_df['Exported_At'], ticker_df['Price'], label=f'{ticker} Price')
-
-        # Set plot labels and title
-        self.ax.set_xlabel('Time')
-        self.ax.set_ylabel('Stock Price')
-        self.ax.set_title('Stock Prices Over Time')
-        self.ax.legend()
-        self.figure.tight_layout()
-        self.canvas.draw()
-
-def main():
-    """
-    Main function to run the data export and plotting.
-    """
-    # Path to the CSV file
-    csv_file = os.path.expanduser(r"/Users/apspa/Documents/PSU/RESEARCH PROJECT/Code/outputs/export.csv")
-    
-    # Export data every 15 minutes for 5 hours (300 minutes)
-    export_data_repeatedly(URL, csv_file, duration_minutes=300, interval_minutes=15)
-    
-    # Initialize and run the PyQt application
-    app = QApplication([])
-    plotter = StockPlotter(csv_file)
-    plotter.show()
-    app.exec_()
+            with metrics.timer('fetch_seconds', host=host):
+                response = session.get(url, timeout=timeout)
+            metrics.inc('bytes_downloaded_total', len(response.content), host=host)
+            metrics.inc('http_responses_total', host=host, status=response.status_code)
+            if response.status_code == 200:
+                return response
+            print(f"Failed to fetch data: {response.status_code}")
+        except requests.RequestException as e:
+            # The exception text holds the full URL and with it the auth token, so only its type is shown
+            print(f"Error fetching data from {host}: {type(e).__name__}")
+        if attempt < retries:
+            metrics.inc('fetch_retries_total', host=host)
+            time.sleep(backoff_seconds * 2 ** attempt)
+    return None
+
+def fetch_snapshot(urls: List[str], session: Optional[requests.Session] = None, max_workers: int = 8,
+                   exported_at: Optional[datetime.datetime] = None, **backoff_kwargs) -> pd.DataFrame:
+    """
+    Fetches all export URLs concurrently and combines them into one snapshot.
+
+    Args:
+        urls (List[str]): Export URLs, e.g. from `build_export_urls`.
+        session (requests.Session, optional): Pooled session to use. A new one is created if None.
+        max_workers (int): Number of URLs fetched at the same time.
+        exported_at (datetime.datetime, optional): Timestamp stored in 'Exported_At'.
+            Defaults to the time the fetch started.
+        **backoff_kwargs: Passed to `fetch_with_backoff`.
+
+    Returns:
+        pd.DataFrame: The snapshot, with the scheduled 'Exported_At', the time each batch was actually
+            'Fetched_At' and its 'Fetch_Latency' in seconds. Empty if no URL could be fetched.
+    """
+    own_session = session is None
+    if own_session:
+        session = create_session(max_workers)
+    if exported_at is None:
+        exported_at = datetime.datetime.now()
+
+    def fetch_one(url: str) -> Optional[pd.DataFrame]:
+        started = time.perf_counter()
+        response = fetch_with_backoff(session, url, **backoff_kwargs)
+        if response is None:
+            return None
+        batch = pd.read_csv(io.StringIO(response.text))
+        batch['Fetched_At'] = datetime.datetime.now()
+        batch['Fetch_Latency'] = time.perf_counter() - started
+        return batch
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            batches = [batch for batch in executor.map(fetch_one, urls) if batch is not None]
+    finally:
+        if own_session:
+            session.close()
+
+    if not batches:
+        return pd.DataFrame()
+    snapshot = pd.concat(batches, ignore_index=True)
+    snapshot['Exported_At'] = exported_at
+    return snapshot
+
+def write_snapshot(snapshot: pd.DataFrame, output_path: str, store: Optional[PartitionedStore] = None):
+    """
+    Appends a snapshot to the specified output file and to the partitioned store.
+    Only the new snapshot is written; existing data is never read back or rewritten.
+    The fetch timing columns are written to the store only.
+    """
+    # Append the snapshot to the CSV, writing the header only for a new or empty file
+    store_snapshot = snapshot
+    snapshot = snapshot.drop(columns=FETCH_TIMING_COLUMNS, errors='ignore')
+    write_header = not os.path.exists(output_path) or os.path.getsize(output_path) == 0
+    if not write_header:
+        # Rows must match the header already in the file, or every reader of it fails to parse them
+        header = pd.read_csv(output_path, nrows=0).columns
+        dropped = snapshot.columns.difference(header)
+        if len(dropped):
+            print(f"Columns not in the header of {output_path} are not written: {', '.join(dropped)}")
+        snapshot = snapshot.reindex(columns=header)
+    snapshot.to_csv(output_path, mode='a', header=write_header, index=False, date_format=EXPORTED_AT_FORMAT)
+    metrics.inc('rows_written_total', len(snapshot), dataset='export')
+
+    # Append the snapshot to the partitioned store
+    if store is not None:
+        store.append('export', store_snapshot, 'Exported_At')
+    print(f"Data successfully exported to {output_path}")
+
+def export_data(url: str, output_path: str, store: Optional[PartitionedStore] = None):
+    """
+    Fetches data from the provided URL and appends it to the specified output file
+    and to the partitioned store.
+    """
+    snapshot = fetch_snapshot([url], retries=0)
+    if not snapshot.empty:
+        write_snapshot(snapshot, output_path, store)
+
+def next_aligned_tick(now: float, interval_seconds: float) -> float:
+    """
+    Returns the first wall-clock multiple of `interval_seconds` at or after `now`
+    (e.g. :00, :15, :30, :45 for a 15 minute interval).
+    """
+    return math.ceil(now / interval_seconds) * interval_seconds
+
+def is_market_open(moment: datetime.datetime) -> bool:
+    """
+    Checks whether a timezone-aware moment falls in the regular US market session.
+    """
+    local = moment.astimezone(MARKET_TIMEZONE)
+    return local.weekday() < 5 and MARKET_OPEN <= local.time() <= MARKET_CLOSE
+
+def export_data_repeatedly(url: Union[str, List[str]], output_path: str, duration_minutes: int, interval_minutes: float,
+                           max_workers: int = 8, market_hours_only: bool = False,
+                           stop_event: Optional[threading.Event] = None, store: Optional[PartitionedStore] = None,
+                           metrics_dir: Optional[str] = None, **backoff_kwargs):
+    """
+    Fetches and appends snapshots on wall-clock-aligned ticks every `interval_minutes`.
+    The time spent fetching does not delay the following ticks, so snapshots stay evenly spaced.
+
+    Args:
+        url (str or List[str]): Export URL, or several URLs (e.g. ticker batches) polled concurrently.
+        output_path (str): CSV file the snapshots are appended to.
+        duration_minutes (int): How long to keep polling.
+        interval_minutes (float): Spacing between snapshots.
+        max_workers (int): Number of URLs fetched at the same time.
+        market_hours_only (bool): Skip ticks outside the regular market session
+            and stop once the market has closed for the day.
+        stop_event (threading.Event, optional): Stops polling early when set.
+        store (PartitionedStore, optional): Store the snapshots are also appended to.
+        metrics_dir (str, optional): Directory the metrics files are refreshed in after every snapshot.
+        **backoff_kwargs: Passed to `fetch_with_backoff`.
+    """
+    urls = [url] if isinstance(url, str) else list(url)
+    interval_seconds = interval_minutes * 60
+    end_time = time.time() + duration_minutes * 60
+    stop_event = stop_event or threading.Event()
+    opened = False
+
+    with create_session(max_workers) as session:
+        while not stop_event.is_set():
+            # Sleep until the next aligned tick instead of a fixed interval after the last fetch
+            tick = next_aligned_tick(time.time(), interval_seconds)
+            if tick >= end_time:
+                break
+            if stop_event.wait(max(0.0, tick - time.time())):
+                break
+
+            tick_time = datetime.datetime.fromtimestamp(tick)
+            if market_hours_only:
+                if not is_market_open(tick_time.astimezone()):
+                    if opened:
+                        print("Market closed, stopping export")
+                        break
+                    continue
+                opened = True
+
+            # Per-batch timing is stored with the rows; the whole snapshot's latency goes to the metrics
+            started = time.perf_counter()
+            snapshot = fetch_snapshot(urls, session, max_workers, exported_at=tick_time, **backoff_kwargs)
+            latency = time.perf_counter() - started
+            metrics.observe('snapshot_fetch_seconds', latency)
+            if snapshot.empty:
+                print(f"No data fetched for tick {tick_time}")
+                continue
+            write_snapshot(snapshot, output_path, store)
+            print(f"Snapshot for {tick_time} fetched in {latency:.2f}s")
+            # Refresh the metrics files after every snapshot so the textfile collector sees progress
+            if metrics_dir is not None:
+                metrics.write_reports(metrics_dir, 'export')
+
+def start_polling_thread(urls: List[str], output_path: str, duration_minutes: int,
+                         interval_minutes: float, **kwargs):
+    """
+    Runs `export_data_repeatedly` in a background thread.
+
+    Returns:
+        Tuple[threading.Thread, threading.Event]: The worker thread and the event that stops it.
+    """
+    stop_event = threading.Event()
+    worker = threading.Thread(
+        target=export_data_repeatedly,
+        args=(urls, output_path, duration_minutes, interval_minutes),
+        kwargs={**kwargs, 'stop_event': stop_event},
+        daemon=True,
+    )
+    worker.start()
+    return worker, stop_event
+
+def main(config: Optional[Config] = None, market_hours_only: bool = False, live_plot: bool = False,
+         once: bool = False):
+    """
+    Poll price snapshots for the configured tickers, headless unless `live_plot` is set.
+
+    Args:
+        config (Config, optional): Directories, tickers, auth token and polling schedule.
+            Loaded with `load_config` if None.
+        market_hours_only (bool): Only poll during the regular market session.
+        live_plot (bool): Show the live price window while polling (needs PyQt5 and matplotlib).
+        once (bool): Fetch a single snapshot now and return, e.g. when run from cron.
+    """
+    config = config or load_config()
+    if not config.auth_token:
+        raise ValueError("No FinViz auth token configured; set auth_token in the config file or FINVIZ_AUTH_TOKEN")
+    # Ensure the directory exists
+    os.makedirs(config.output_dir, exist_ok=True)
+
+    # Export data every interval for the configured duration, in batches of at most batch_size tickers
+    export_urls = build_export_urls(config.universe(), config.auth_token, config.batch_size)
+    if once:
+        snapshot = fetch_snapshot(export_urls)
+        if not snapshot.empty:
+            write_snapshot(snapshot, config.export_file_path, PartitionedStore(config.store_dir))
+        metrics.write_reports(config.metrics_dir, 'export')
+        return
+
+    polling_kwargs = dict(market_hours_only=market_hours_only, store=PartitionedStore(config.store_dir),
+                          metrics_dir=config.metrics_dir)
+    if not live_plot:
+        export_data_repeatedly(export_urls, config.export_file_path, config.duration_minutes,
+                               config.interval_minutes, **polling_kwargs)
+        return
+
+    # The GUI stack is only imported when a window is requested
+    import plotter
+
+    # Poll in the background and plot new snapshots as they arrive
+    worker, stop_event = start_polling_thread(export_urls, config.export_file_path, config.duration_minutes,
+                                              config.interval_minutes, **polling_kwargs)
+    plotter.show_plot(config.export_file_path, live=True)
+
+    # Stop polling once the window is closed
+    stop_event.set()
+    worker.join()
 
 if __name__ == "__main__":
     main()
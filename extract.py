@@ -0,0 +1,144 @@
+import re
+from typing import Optional
+
+import metrics
+
+try:
+    from lxml import etree
+    from lxml import html as lxml_html
+except ImportError:  # lxml is optional; the BeautifulSoup path below is used without it
+    etree = None
+    lxml_html = None
+
+# Largest article body read from the network; the rest of the page is not downloaded
+DEFAULT_MAX_BYTES = 1024 * 1024
+# Elements that never hold article text
+BOILERPLATE_TAGS = ('script', 'style', 'noscript', 'template', 'nav', 'header', 'footer', 'aside',
+                    'form', 'iframe', 'svg', 'button', 'figure')
+# Words of a class/id token (split on - and _) marking cookie banners, share bars, newsletters,
+# related links and similar, e.g. `cookie-banner`, `related-articles` or `social-share`
+BOILERPLATE_PATTERN = re.compile(
+    r'(?:cookie|consent|gdpr|banner|footer|subscribe|newsletter|promo|related|share|social|'
+    r'advert|ads?|sponsor|comments?|sidebar|navbar|menu|popup|modal|paywall|breadcrumbs?|disclaimer)',
+    re.IGNORECASE,
+)
+# Words after which a token describes a state or a script hook rather than the element itself:
+# `has-sidebar`, `no-ads`, `js-share-tracking` and `page-with-sidebar` are article containers
+MODIFIER_WORDS = frozenset(('has', 'no', 'not', 'is', 'js', 'with', 'without', 'hide', 'show'))
+TOKEN_SEPARATOR = re.compile(r'[-_]+')
+# Paragraphs shorter than this are mostly captions, bylines and button labels
+MIN_PARAGRAPH_CHARS = 40
+
+def read_capped(response, max_bytes: int = DEFAULT_MAX_BYTES, chunk_size: int = 64 * 1024) -> bytes:
+    """
+    Reads a streamed response body, stopping after `max_bytes`.
+
+    Args:
+        response (requests.Response): Response of a request made with `stream=True`.
+        max_bytes (int): Maximum number of bytes to read.
+        chunk_size (int): Size of the chunks read from the socket.
+
+    Returns:
+        bytes: At most `max_bytes` of the body.
+    """
+    chunks = []
+    received = 0
+    try:
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            chunks.append(chunk)
+            received += len(chunk)
+            if received >= max_bytes:
+                metrics.inc('html_truncated_total')
+                break
+    finally:
+        response.close()
+    return b''.join(chunks)[:max_bytes]
+
+def _is_boilerplate_token(token: str) -> bool:
+    for word in TOKEN_SEPARATOR.split(token.lower()):
+        if word in MODIFIER_WORDS:
+            return False
+        if BOILERPLATE_PATTERN.fullmatch(word):
+            return True
+    return False
+
+def _is_boilerplate(element) -> bool:
+    tokens = f"{element.get('class', '')} {element.get('id', '')}".split()
+    return any(_is_boilerplate_token(token) for token in tokens)
+
+def _extract_with_lxml(html: bytes) -> str:
+    document = lxml_html.fromstring(html)
+    etree.strip_elements(document, *BOILERPLATE_TAGS, with_tail=False)
+    etree.strip_elements(document, etree.Comment, with_tail=False)
+
+    # Containers whose class or id marks them as boilerplate
+    boilerplate = {element for element in document.iter('div', 'section', 'ul', 'ol', 'p', 'span', 'table')
+                   if element.getparent() is not None and _is_boilerplate(element)}
+
+    # The article body is the <article>, or otherwise the element holding the most paragraph text.
+    # Blocks outside boilerplate containers are preferred; a page marked as boilerplate throughout
+    # still yields its largest block
+    articles = document.xpath('//article')
+    best, best_length, best_is_boilerplate = None, 0, True
+    for candidate in articles or [document]:
+        length_by_parent = {}
+        for paragraph in candidate.iter('p'):
+            parent = paragraph.getparent()
+            length_by_parent[parent] = length_by_parent.get(parent, 0) + len(paragraph.text_content())
+        for parent, length in length_by_parent.items():
+            is_boilerplate = parent in boilerplate or any(a in boilerplate for a in parent.iterancestors())
+            if (best_is_boilerplate and not is_boilerplate) or \
+                    (is_boilerplate == best_is_boilerplate and length > best_length):
+                best, best_length, best_is_boilerplate = parent, length, is_boilerplate
+    if best is None:
+        return ''
+
+    # Drop the boilerplate containers, but never one holding the chosen block or an <article>
+    protected = {best, *best.iterancestors()}
+    for article in articles:
+        protected.update([article, *article.iterancestors()])
+    for element in boilerplate - protected:
+        if element.getparent() is not None:
+            element.drop_tree()
+
+    paragraphs = [' '.join(paragraph.text_content().split()) for paragraph in best.iter('p')]
+    long_paragraphs = [text for text in paragraphs if len(text) >= MIN_PARAGRAPH_CHARS]
+    # Keep short paragraphs only when the article has nothing longer
+    return ' '.join(long_paragraphs or [text for text in paragraphs if text])
+
+def _extract_with_beautifulsoup(html: bytes) -> str:
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, 'html.parser')
+    # Extract all paragraph text from the article
+    paragraphs = soup.find_all('p')
+    return ' '.join([para.get_text() for para in paragraphs])
+
+def extract_article_text(html: bytes, engine: Optional[str] = None) -> str:
+    """
+    Extracts the body text of an article page.
+
+    Uses lxml with boilerplate removal when it is installed, and falls back to joining
+    every <p> with BeautifulSoup's html.parser otherwise (or if lxml cannot parse the page
+    or finds no text in it).
+
+    Args:
+        html (bytes): The raw page.
+        engine (str, optional): Force 'lxml' or 'html.parser'.
+
+    Returns:
+        str: The article text.
+    """
+    if not html:
+        return ''
+    if engine != 'html.parser' and lxml_html is not None:
+        try:
+            with metrics.timer('html_parse_seconds', engine='lxml'):
+                text = _extract_with_lxml(html)
+            if text:
+                return text
+            metrics.inc('html_extract_fallback_total')
+        except (etree.ParserError, ValueError) as e:
+            print(f"lxml could not parse the page, falling back to html.parser: {e}")
+    with metrics.timer('html_parse_seconds', engine='html.parser'):
+        return _extract_with_beautifulsoup(html)
@@ -0,0 +1,103 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+# Define headers to mimic a real browser request
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+class HostRateLimiter:
+    def __init__(self, min_interval: float):
+        """
+        Spaces out requests to the same host by at least `min_interval` seconds.
+        Requests to different hosts are not delayed by each other.
+        """
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_slot: Dict[str, float] = {}
+
+    def wait(self, host: str):
+        """
+        Blocks until a request to `host` is allowed, reserving the next slot for it.
+        """
+        # Reserve a slot under the lock, then sleep outside it so other hosts are not blocked
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.min_interval
+        delay = slot - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+class ArticleFetcher:
+    def __init__(self, max_workers: int = 16, per_host_interval: float = 1.0, timeout: float = 10.0):
+        """
+        Fetches many URLs concurrently over a shared, connection-pooled session.
+
+        Args:
+            max_workers (int): Number of threads fetching at the same time.
+            per_host_interval (float): Minimum seconds between two requests to the same host.
+            timeout (float): Connect/read timeout in seconds for each request.
+        """
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.rate_limiter = HostRateLimiter(per_host_interval)
+
+        # Size the connection pool so every worker can keep a connection alive
+        self.session = requests.Session()
+        self.session.headers.update(DEFAULT_HEADERS)
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """
+        Sends a GET request after waiting for the host's rate limit.
+        With `stream=True` only the headers are read; the caller reads and closes the body.
+        """
+        host = urlsplit(url).netloc
+        self.rate_limiter.wait(host)
+        kwargs.setdefault('timeout', self.timeout)
+        with metrics.timer('fetch_seconds', host=host):
+            response = self.session.get(url, **kwargs)
+        # Streamed bodies are counted by whoever reads them
+        if not kwargs.get('stream'):
+            metrics.inc('bytes_downloaded_total', len(response.content), host=host)
+        metrics.inc('http_responses_total', host=host, status=response.status_code)
+        return response
+
+    def fetch_all(self, urls: Iterable[str], fetch: Callable[[str], str]) -> Dict[str, str]:
+        """
+        Runs `fetch(url)` for every unique URL on the worker pool.
+
+        Args:
+            urls (Iterable[str]): The URLs to fetch; duplicates are fetched once.
+            fetch (Callable[[str], str]): Function that fetches and parses a single URL.
+
+        Returns:
+            Dict[str, str]: Mapping of URL to the value returned by `fetch`.
+        """
+        unique_urls = list(dict.fromkeys(urls))
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = executor.map(fetch, unique_urls)
+            return dict(zip(unique_urls, results))
+
+    def close(self):
+        """
+        Closes the pooled connections.
+        """
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
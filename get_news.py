@@ -1,50 +1,218 @@
-from finvizfinance.quote import finvizfinance
 import os
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, List, Optional
+from config import Config, load_config
+from fetcher import HostRateLimiter
+from processed_index import ProcessedIndex, content_hash
+from storage import PartitionedStore
+import metrics
 
-# List of tickers to fetch news for
-tickers = ['AMZN', 'AAPL', 'GOOGL']  # Add more tickers as needed
+# File name of the (ticker, Link) index of headlines already written, in the news directory
+NEWS_INDEX_FILENAME = "news_links.index"
+# Format of the 'Date' column returned by Finviz
+NEWS_DATE_FORMAT = '%m/%d/%Y %I:%M:%S %p'
 
-# Define the directory to save the CSV files
-output_dir = os.path.expanduser(r"/Users/apspa/Documents/PSU/RESEARCH PROJECT/Code/outputs/")
+def finviz_fetcher(ticker: str) -> pd.DataFrame:
+    """
+    Fetch news for the specific stock ticker using Finviz.
+    """
+    from finvizfinance.quote import finvizfinance
 
-# Create the output directory if it doesn't exist
-os.makedirs(output_dir, exist_ok=True)
+    return finvizfinance(ticker).ticker_news()
 
-# Loop through each ticker and fetch news
-for ticker in tickers:
-    print(f"Fetching news for ticker: {ticker}")
-    
-    # Fetch news for the specific stock ticker using Finviz
-    stock = finvizfinance(ticker)
-    news_df = stock.ticker_news()
+class FixtureFetcher:
+    def __init__(self, fixture_dir: str):
+        """
+        Fetcher that replays news recorded as `<fixture_dir>/<TICKER>.csv`, for offline runs.
+        """
+        self.fixture_dir = fixture_dir
+
+    def __call__(self, ticker: str) -> pd.DataFrame:
+        fixture_path = os.path.join(self.fixture_dir, f"{ticker}.csv")
+        if not os.path.exists(fixture_path):
+            return pd.DataFrame(columns=['Date', 'Title', 'Link', 'Source'])
+        return pd.read_csv(fixture_path)
+
+class RecordingFetcher:
+    def __init__(self, fetcher: Callable[[str], pd.DataFrame], fixture_dir: str):
+        """
+        Wraps a fetcher and saves every response as a fixture readable by FixtureFetcher.
+        """
+        self.fetcher = fetcher
+        self.fixture_dir = fixture_dir
+        os.makedirs(fixture_dir, exist_ok=True)
+
+    def __call__(self, ticker: str) -> pd.DataFrame:
+        news_df = self.fetcher(ticker)
+        news_df.to_csv(os.path.join(self.fixture_dir, f"{ticker}.csv"), index=False)
+        return news_df
+
+def news_key(ticker: str, link: str) -> str:
+    """
+    Key of a headline in the news index.
+    """
+    return f"{ticker} {link}"
+
+def load_news_index(index_path: str, universe: List[str], news_dir: str) -> ProcessedIndex:
+    """
+    Load the (ticker, Link) index, seeding it from existing news CSVs the first time.
+    Entries of tickers whose news CSV is empty or missing are dropped, so headlines of a
+    truncated or deleted file are collected again.
+    """
+    bootstrap = not os.path.exists(index_path)
+    index = ProcessedIndex(index_path)
+    empty_tickers = set()
+    for ticker in universe:
+        news_file_path = os.path.join(news_dir, f"{ticker}_today_news.csv")
+        if not os.path.exists(news_file_path) or os.path.getsize(news_file_path) == 0:
+            empty_tickers.add(ticker)
+        elif bootstrap:
+            links = pd.read_csv(news_file_path, usecols=['Link'])['Link'].dropna()
+            index.add_many((news_key(ticker, link), '') for link in links)
+    if not bootstrap and empty_tickers:
+        removed = index.retain(lambda key: key.partition(' ')[0] not in empty_tickers)
+        if removed:
+            print(f"Dropped {removed} indexed headlines of tickers without a news file")
+    return index
+
+def parse_news_dates(dates: pd.Series) -> pd.Series:
+    """
+    Convert the 'Date' column to datetime, accepting Finviz's format and already-parsed dates.
+    """
+    parsed = pd.to_datetime(dates, format=NEWS_DATE_FORMAT, errors='coerce')
+    unparsed = parsed.isna() & dates.notna()
+    if unparsed.any():
+        parsed[unparsed] = pd.to_datetime(dates[unparsed], format='mixed', errors='coerce')
+    return parsed
+
+def select_new_headlines(ticker: str, news_df: pd.DataFrame, index: ProcessedIndex,
+                         today: pd.Timestamp) -> pd.DataFrame:
+    """
+    Keep today's headlines of a ticker whose (ticker, Link) is not in the index.
     
-    # Convert 'Date' column to datetime format
-    news_df['Date'] = pd.to_datetime(news_df['Date'], format='%m/%d/%Y %I:%M:%S %p')
+    Args:
+        ticker (str): The ticker the news belongs to.
+        news_df (pd.DataFrame): News table returned by a fetcher.
+        index (ProcessedIndex): (ticker, Link) index of headlines already written.
+        today (pd.Timestamp): Day to keep articles from (normalized).
     
-    # Filter articles from today's date
-    today = pd.Timestamp('today').normalize()  # Normalize to remove time part
+    Returns:
+        pd.DataFrame: The new headlines, newest first.
+    """
+    if news_df is None or news_df.empty:
+        return pd.DataFrame(columns=['Date', 'Title', 'Link', 'Source'])
+
+    # Convert 'Date' column to datetime format and filter articles from today's date
+    news_df = news_df.assign(Date=parse_news_dates(news_df['Date']))
     today_news_df = news_df[news_df['Date'].dt.normalize() == today]
-    
+
+    # Keep only headlines whose (ticker, Link) has not been written before
+    today_news_df = today_news_df.dropna(subset=['Link']).drop_duplicates(subset=['Link'])
+    keys = today_news_df['Link'].map(lambda link: news_key(ticker, link))
+    today_news_df = today_news_df[~keys.isin(index.keys())]
+
     # Sort DataFrame by 'Date' in descending order
-    today_news_df = today_news_df.sort_values(by='Date', ascending=False)
-    
-    # Define the output file path
-    output_file_path = os.path.join(output_dir, f"{ticker}_today_news.csv")
-    
-    # Check if file exists and is empty
-    file_exists = os.path.exists(output_file_path)
-    is_empty = file_exists and os.path.getsize(output_file_path) == 0
-    
-    # Determine if header should be written based on file existence and content
-    if file_exists and not is_empty:
-        header = False  # Do not write header if file already exists and is not empty
-    else:
-        header = True  # Write header if file does not exist or is empty
+    return today_news_df.sort_values(by='Date', ascending=False)
+
+def save_headlines(ticker: str, today_news_df: pd.DataFrame, news_dir: str, index: ProcessedIndex,
+                   store: Optional[PartitionedStore] = None) -> str:
+    """
+    Append new headlines to the ticker's CSV (and the store), then record them in the index.
     
-    # Save the filtered DataFrame to a CSV file, appending if it already exists
+    Returns:
+        str: Path of the ticker's news CSV.
+    """
+    # Append to the ticker's CSV, writing the header only for a new or empty file
+    output_file_path = os.path.join(news_dir, f"{ticker}_today_news.csv")
+    header = not os.path.exists(output_file_path) or os.path.getsize(output_file_path) == 0
     today_news_df.to_csv(output_file_path, mode='a', header=header, index=False)
-    
-    print(f"Today's news articles for {ticker} have been saved to {output_file_path}")
+    metrics.inc('rows_written_total', len(today_news_df), dataset='news')
+
+    # Append the same rows to the partitioned store
+    if store is not None:
+        store.append('news', today_news_df.assign(Ticker=ticker), 'Date')
+
+    # Record the headlines only once they are on disk
+    index.add_many(
+        (news_key(ticker, row.Link), content_hash(row.Title))
+        for row in today_news_df[['Link', 'Title']].itertuples(index=False)
+    )
+    return output_file_path
+
+def collect_news(universe: List[str], news_dir: str, fetcher: Callable[[str], pd.DataFrame] = finviz_fetcher,
+                 index: Optional[ProcessedIndex] = None, store: Optional[PartitionedStore] = None,
+                 max_workers: int = 8, min_interval: float = 0.5,
+                 today: Optional[pd.Timestamp] = None) -> int:
+    """
+    Fetch today's news for every ticker and append only headlines not seen before.
+
+    Args:
+        universe (List[str]): Tickers to fetch news for.
+        news_dir (str): Directory of the `<TICKER>_today_news.csv` files.
+        fetcher (Callable[[str], pd.DataFrame]): Returns the news table of a ticker.
+        index (ProcessedIndex, optional): (ticker, Link) index. Loaded from `news_dir` if None.
+        store (PartitionedStore, optional): Store the new rows are also appended to.
+        max_workers (int): Number of tickers fetched at the same time.
+        min_interval (float): Minimum seconds between two fetcher calls.
+        today (pd.Timestamp, optional): Day to keep articles from. Defaults to today.
+
+    Returns:
+        int: Number of new headlines written.
+    """
+    if index is None:
+        index = load_news_index(os.path.join(news_dir, NEWS_INDEX_FILENAME), universe, news_dir)
+    today = (pd.Timestamp('today') if today is None else pd.Timestamp(today)).normalize()
+    # All tickers hit the same site, so a single rate limit slot is shared by every worker
+    rate_limiter = HostRateLimiter(min_interval)
+
+    def fetch_ticker(ticker: str) -> pd.DataFrame:
+        rate_limiter.wait('finviz')
+        with metrics.timer('news_fetch_seconds'):
+            return fetcher(ticker)
+
+    written = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(fetch_ticker, ticker): ticker for ticker in universe}
+        # Write from this thread only, as results come in
+        for future in as_completed(futures):
+            ticker = futures[future]
+            try:
+                news_df = future.result()
+            except Exception as e:
+                print(f"Error fetching news for ticker {ticker}: {e}")
+                continue
+
+            today_news_df = select_new_headlines(ticker, news_df, index, today)
+            if today_news_df.empty:
+                continue
+            output_file_path = save_headlines(ticker, today_news_df, news_dir, index, store)
+            written += len(today_news_df)
+            print(f"{len(today_news_df)} new articles for {ticker} saved to {output_file_path}")
+    return written
+
+def main(config: Optional[Config] = None, max_workers: int = 8, min_interval: float = 0.5):
+    """
+    Fetch and save new headlines for every ticker of the universe.
+
+    Args:
+        config (Config, optional): Directories and tickers. Loaded with `load_config` if None.
+        max_workers (int): Number of tickers fetched at the same time.
+        min_interval (float): Minimum seconds between two Finviz requests.
+    """
+    config = config or load_config()
+    # Create the output directory if it doesn't exist
+    os.makedirs(config.output_dir, exist_ok=True)
+
+    # Define the Parquet store (partitioned by date and ticker) next to the CSV outputs
+    store = PartitionedStore(config.store_dir)
+
+    universe = config.universe()
+    print(f"Fetching news for {len(universe)} tickers")
+    written = collect_news(universe, config.output_dir, store=store, max_workers=max_workers,
+                           min_interval=min_interval)
+    metrics.write_reports(config.metrics_dir, 'get_news')
+    print(f"All news articles have been saved ({written} new).")
 
-print("All news articles have been saved.")
+if __name__ == "__main__":
+    main()
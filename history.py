@@ -0,0 +1,184 @@
+import os
+from typing import Iterable, List, Optional
+
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from storage import PartitionedStore
+
+# Rows read from a CSV at a time; memory use is bounded by this plus the rows that pass the filters
+DEFAULT_CHUNKSIZE = 100000
+# Columns loaded for price history, and the score columns loaded for sentiment history
+PRICE_COLUMNS = ['Ticker', 'Exported_At', 'Price']
+SENTIMENT_COLUMNS = ['Title_Sentiment', 'Content_Sentiment', 'Combined_Sentiment']
+# Closed days of every working CSV are archived by clear.py under this sub-directory of the output directory
+ARCHIVE_DIR_NAME = "archive"
+
+def archive_dir(output_dir: str, filename: str) -> str:
+    """
+    Directory holding the `<YYYY-MM-DD>.csv.gz` archives of a working CSV.
+    """
+    return os.path.join(output_dir, ARCHIVE_DIR_NAME, os.path.splitext(filename)[0])
+
+def history_files(output_dir: str, filename: str, start: Optional[pd.Timestamp] = None,
+                  end: Optional[pd.Timestamp] = None) -> List[str]:
+    """
+    Lists the archived days of a working CSV within the date range, oldest first, followed by
+    the working file itself, so loaders see history that maintenance moved out of it.
+    """
+    start_day = pd.Timestamp(start).strftime('%Y-%m-%d') if start is not None else None
+    end_day = pd.Timestamp(end).strftime('%Y-%m-%d') if end is not None else None
+    days_dir = archive_dir(output_dir, filename)
+    paths = []
+    if os.path.isdir(days_dir):
+        for name in sorted(os.listdir(days_dir)):
+            day = name[:len('YYYY-MM-DD')]
+            if not name.endswith('.csv.gz') or (start_day and day < start_day) or (end_day and day > end_day):
+                continue
+            paths.append(os.path.join(days_dir, name))
+    return paths + [os.path.join(output_dir, filename)]
+
+def _ticker_of(path: str) -> str:
+    # Archived days are named by date and live in a directory named after the working file
+    name = os.path.basename(path)
+    if name.endswith('.csv.gz'):
+        name = os.path.basename(os.path.dirname(path))
+    return name.split('_')[0]
+
+def downcast(df: pd.DataFrame, float_columns: Iterable[str]) -> pd.DataFrame:
+    """
+    Stores tickers as a category and the given value columns as float32.
+    """
+    df = df.copy()
+    if isinstance(df.get('Ticker', None), pd.Series) and isinstance(df['Ticker'].dtype, pd.CategoricalDtype):
+        df['Ticker'] = df['Ticker'].cat.remove_unused_categories()
+    elif 'Ticker' in df.columns:
+        df['Ticker'] = df['Ticker'].astype(str).astype('category')
+    for column in float_columns:
+        if column in df.columns:
+            df[column] = pd.to_numeric(df[column], errors='coerce').astype('float32')
+    return df
+
+def _concat(frames: List[pd.DataFrame], columns: List[str]) -> pd.DataFrame:
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    # Concatenating categoricals with different categories would fall back to object strings
+    tickers = union_categoricals([frame['Ticker'] for frame in frames], ignore_order=True)
+    df = pd.concat([frame.drop(columns='Ticker') for frame in frames], ignore_index=True)
+    df.insert(0, 'Ticker', tickers)
+    return df
+
+def read_csv_filtered(csv_path: str, time_column: str, value_columns: List[str],
+                      tickers: Optional[Iterable[str]] = None, start: Optional[pd.Timestamp] = None,
+                      end: Optional[pd.Timestamp] = None, ticker: Optional[str] = None,
+                      chunksize: int = DEFAULT_CHUNKSIZE, time_ordered: bool = False) -> pd.DataFrame:
+    """
+    Reads the rows of one CSV that match the ticker and time filters, a chunk at a time.
+
+    Only `time_column`, 'Ticker' and `value_columns` are parsed, and each chunk is filtered and
+    downcast before the next is read, so memory holds one chunk plus the matching rows.
+
+    Args:
+        csv_path (str): The CSV file.
+        time_column (str): Column with the row time ('Exported_At' or 'Date').
+        value_columns (List[str]): Numeric columns to load as float32.
+        tickers (Iterable[str], optional): Tickers to keep. All if None.
+        start (pd.Timestamp, optional): Earliest time to keep (inclusive).
+        end (pd.Timestamp, optional): Latest time to keep (inclusive).
+        ticker (str, optional): Ticker of every row, for per-ticker files without a 'Ticker' column.
+        chunksize (int): Rows parsed at a time.
+        time_ordered (bool): The file is appended in time order (as export.csv is), so reading
+            stops at the first chunk that starts after `end`.
+
+    Returns:
+        pd.DataFrame: 'Ticker', `time_column` and `value_columns` of the matching rows.
+    """
+    columns = ['Ticker', time_column] + list(value_columns)
+    ticker_set = set(tickers) if tickers is not None else None
+    if ticker is not None and ticker_set is not None and ticker not in ticker_set:
+        return pd.DataFrame(columns=columns)
+    if not os.path.exists(csv_path) or os.path.getsize(csv_path) == 0:
+        return pd.DataFrame(columns=columns)
+    start = pd.Timestamp(start) if start is not None else None
+    end = pd.Timestamp(end) if end is not None else None
+
+    usecols = [time_column] + list(value_columns) + ([] if ticker is not None else ['Ticker'])
+    frames = []
+    reader = pd.read_csv(csv_path, usecols=usecols, chunksize=chunksize,
+                         dtype={'Ticker': 'category'} if ticker is None else None)
+    with reader:
+        for chunk in reader:
+            if ticker is not None:
+                chunk['Ticker'] = ticker
+            elif ticker_set is not None:
+                chunk = chunk[chunk['Ticker'].isin(ticker_set)]
+            chunk[time_column] = pd.to_datetime(chunk[time_column], format='ISO8601', errors='coerce')
+            times = chunk[time_column]
+            if time_ordered and end is not None and not times.empty and times.min() > end:
+                break
+            keep = times.notna()
+            if start is not None:
+                keep &= times >= start
+            if end is not None:
+                keep &= times <= end
+            if keep.any():
+                frames.append(downcast(chunk.loc[keep, columns], value_columns))
+    return _concat(frames, columns)
+
+def load_prices(csv_paths: Iterable[str], tickers: Optional[Iterable[str]] = None,
+                start: Optional[pd.Timestamp] = None, end: Optional[pd.Timestamp] = None,
+                store: Optional[PartitionedStore] = None, chunksize: int = DEFAULT_CHUNKSIZE) -> pd.DataFrame:
+    """
+    Loads price snapshots ('Ticker', 'Exported_At', 'Price') with categorical tickers and float32 prices.
+
+    Args:
+        csv_paths (Iterable[str]): Export CSVs (and their archived days, in time order) to read
+            when the store has no 'export' data.
+        tickers (Iterable[str], optional): Tickers to load. All if None.
+        start (pd.Timestamp, optional): Earliest snapshot time (inclusive).
+        end (pd.Timestamp, optional): Latest snapshot time (inclusive).
+        store (PartitionedStore, optional): Parquet store read instead of the CSVs when it holds
+            snapshots; only the matching date/ticker partitions are opened.
+        chunksize (int): CSV rows parsed at a time.
+
+    Returns:
+        pd.DataFrame: The matching snapshots sorted by time.
+    """
+    if store is not None and store.partition_files('export'):
+        df = store.read('export', 'Exported_At', tickers, start, end, columns=['Price'])
+        df = downcast(df[PRICE_COLUMNS], ['Price'])
+    else:
+        df = _concat([read_csv_filtered(path, 'Exported_At', ['Price'], tickers, start, end,
+                                        chunksize=chunksize, time_ordered=True) for path in csv_paths],
+                     PRICE_COLUMNS)
+    return df.sort_values('Exported_At', kind='stable').reset_index(drop=True)
+
+def load_sentiment(csv_paths: Iterable[str], tickers: Optional[Iterable[str]] = None,
+                   start: Optional[pd.Timestamp] = None, end: Optional[pd.Timestamp] = None,
+                   store: Optional[PartitionedStore] = None, chunksize: int = DEFAULT_CHUNKSIZE) -> pd.DataFrame:
+    """
+    Loads scored articles ('Ticker', 'Date' and the sentiment scores) with categorical tickers
+    and float32 scores.
+
+    Args:
+        csv_paths (Iterable[str]): `<TICKER>_today_news_with_sentiment.csv` files (and their archived
+            days) to read when the store has no 'sentiment' data. The ticker is taken from the file name.
+        tickers (Iterable[str], optional): Tickers to load. Files of other tickers are not opened.
+        start (pd.Timestamp, optional): Earliest article time (inclusive).
+        end (pd.Timestamp, optional): Latest article time (inclusive).
+        store (PartitionedStore, optional): Parquet store read instead of the CSVs when it holds articles.
+        chunksize (int): CSV rows parsed at a time.
+
+    Returns:
+        pd.DataFrame: The matching articles sorted by time.
+    """
+    columns = ['Ticker', 'Date'] + SENTIMENT_COLUMNS
+    if store is not None and store.partition_files('sentiment'):
+        df = store.read('sentiment', 'Date', tickers, start, end, columns=SENTIMENT_COLUMNS)
+        df = downcast(df[columns], SENTIMENT_COLUMNS)
+    else:
+        df = _concat([read_csv_filtered(path, 'Date', SENTIMENT_COLUMNS, tickers, start, end,
+                                        ticker=_ticker_of(path), chunksize=chunksize)
+                      for path in csv_paths], columns)
+    return df.sort_values('Date', kind='stable').reset_index(drop=True)
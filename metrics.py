@@ -0,0 +1,177 @@
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+# Upper bounds (in the metric's unit) of the Prometheus histogram buckets
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Number of raw samples kept per histogram for the percentiles of the JSON summary
+MAX_SAMPLES = 10000
+
+def _label_key(labels: Dict[str, str]) -> Tuple:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+def _format_labels(label_key: Tuple, extra: Tuple = ()) -> str:
+    pairs = list(label_key) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        """
+        Cumulative-bucket histogram that also keeps a bounded random sample for percentiles.
+        """
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.samples: List[float] = []
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for position, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.bucket_counts[position] += 1
+        # Reservoir sampling keeps memory bounded on long runs
+        if len(self.samples) < MAX_SAMPLES:
+            self.samples.append(value)
+        else:
+            slot = random.randrange(self.count)
+            if slot < MAX_SAMPLES:
+                self.samples[slot] = value
+
+    def percentile(self, fraction: float) -> float:
+        ordered = sorted(self.samples)
+        if not ordered:
+            return 0.0
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+class MetricsRegistry:
+    def __init__(self):
+        """
+        Thread-safe collection of labelled counters and histograms.
+        """
+        self._lock = threading.Lock()
+        self.counters: Dict[str, Dict[Tuple, float]] = {}
+        self.histograms: Dict[str, Dict[Tuple, Histogram]] = {}
+        self.help: Dict[str, str] = {}
+        self.started_at = time.time()
+
+    def inc(self, name: str, value: float = 1, help_text: str = '', **labels):
+        """
+        Adds `value` to a counter.
+        """
+        key = _label_key(labels)
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+            if help_text:
+                self.help.setdefault(name, help_text)
+
+    def observe(self, name: str, value: float, help_text: str = '', buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+                **labels):
+        """
+        Records one observation in a histogram.
+        """
+        key = _label_key(labels)
+        with self._lock:
+            series = self.histograms.setdefault(name, {})
+            if key not in series:
+                series[key] = Histogram(buckets)
+            series[key].observe(value)
+            if help_text:
+                self.help.setdefault(name, help_text)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """
+        Observes the duration of the `with` block in seconds.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def to_prometheus(self) -> str:
+        """
+        Renders all metrics in the Prometheus text exposition format.
+        """
+        lines = []
+        with self._lock:
+            for name, series in sorted(self.counters.items()):
+                if name in self.help:
+                    lines.append(f"# HELP {name} {self.help[name]}")
+                lines.append(f"# TYPE {name} counter")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+            for name, series in sorted(self.histograms.items()):
+                if name in self.help:
+                    lines.append(f"# HELP {name} {self.help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, histogram in sorted(series.items()):
+                    for bound, count in zip(histogram.buckets, histogram.bucket_counts):
+                        lines.append(f"{name}_bucket{_format_labels(key, (('le', repr(bound)),))} {count}")
+                    lines.append(f"{name}_bucket{_format_labels(key, (('le', '+Inf'),))} {histogram.count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {histogram.sum}")
+                    lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+        return '\n'.join(lines) + '\n'
+
+    def summary(self) -> Dict:
+        """
+        Returns counters and histogram statistics (count, sum, mean, p50, p99, max) as plain data.
+        """
+        def label_text(key: Tuple) -> str:
+            return ','.join(f"{name}={value}" for name, value in key) or 'all'
+
+        with self._lock:
+            return {
+                'duration_seconds': round(time.time() - self.started_at, 3),
+                'counters': {
+                    name: {label_text(key): value for key, value in series.items()}
+                    for name, series in self.counters.items()
+                },
+                'histograms': {
+                    name: {
+                        label_text(key): {
+                            'count': histogram.count,
+                            'sum': round(histogram.sum, 6),
+                            'mean': round(histogram.sum / histogram.count, 6) if histogram.count else 0.0,
+                            'p50': round(histogram.percentile(0.5), 6),
+                            'p99': round(histogram.percentile(0.99), 6),
+                            'max': round(max(histogram.samples), 6) if histogram.samples else 0.0,
+                        }
+                        for key, histogram in series.items()
+                    }
+                    for name, series in self.histograms.items()
+                },
+            }
+
+    def write_reports(self, metrics_dir: str, job: str):
+        """
+        Writes `<job>.prom` (for the node_exporter textfile collector) and `<job>.json` to `metrics_dir`.
+        Files are written to a temporary name first so collectors never read a partial file.
+        """
+        os.makedirs(metrics_dir, exist_ok=True)
+        reports = {
+            f"{job}.prom": self.to_prometheus(),
+            f"{job}.json": json.dumps(self.summary(), indent=2),
+        }
+        for filename, content in reports.items():
+            path = os.path.join(metrics_dir, filename)
+            with open(f"{path}.tmp", 'w', encoding='utf-8') as file:
+                file.write(content)
+            os.replace(f"{path}.tmp", path)
+
+# Process-wide registry used by the scripts
+REGISTRY = MetricsRegistry()
+inc = REGISTRY.inc
+observe = REGISTRY.observe
+timer = REGISTRY.timer
+write_reports = REGISTRY.write_reports
@@ -0,0 +1,296 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterable, List, Optional
+
+import pandas as pd
+
+import analyze_news
+import get_news
+from config import Config, load_config
+from processed_index import content_hash
+import metrics
+
+# Marker telling a stage worker that no more items will come
+_STOP = object()
+# Times an article is fetched before the pipeline gives up on it until the next run
+MAX_FETCH_ATTEMPTS = 3
+
+class Stage:
+    def __init__(self, name: str, func: Callable, workers: int = 1, queue_size: int = 100):
+        """
+        One pipeline stage: `workers` threads taking items from a bounded input queue.
+
+        Args:
+            name (str): Stage name used in log messages.
+            func (Callable): Called with each item; returns an iterable of items for the next stage.
+            workers (int): Number of threads running `func`.
+            queue_size (int): Capacity of the input queue. Upstream stages block when it is full.
+        """
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.input = queue.Queue(maxsize=queue_size)
+        self.downstream: Optional['Stage'] = None
+        self.processed = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._finished = 0
+        self._threads: List[threading.Thread] = []
+
+    def start(self):
+        for number in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"{self.name}-{number}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        """
+        Tells every worker to finish once the items already queued are handled.
+        """
+        for _ in range(self.workers):
+            self.input.put(_STOP)
+
+    def join(self):
+        for thread in self._threads:
+            thread.join()
+
+    def _run(self):
+        while True:
+            item = self.input.get()
+            if item is _STOP:
+                break
+            try:
+                with metrics.timer('pipeline_stage_seconds', stage=self.name):
+                    results = list(self.func(item) or ())
+                for result in results:
+                    # Blocks while the next stage is full, which slows this stage down
+                    self.downstream.input.put(result)
+                with self._lock:
+                    self.processed += 1
+                metrics.inc('pipeline_items_total', stage=self.name)
+            except Exception as e:
+                print(f"Error in {self.name} stage: {e}")
+                with self._lock:
+                    self.errors += 1
+
+        # The last worker to finish passes the shutdown on to the next stage
+        with self._lock:
+            self._finished += 1
+            last = self._finished == self.workers
+        if last and self.downstream is not None:
+            self.downstream.stop()
+
+class NewsPipeline:
+    def __init__(self, universe: List[str], news_dir: str, sentiment_dir: str,
+                 news_fetcher: Callable[[str], pd.DataFrame] = get_news.finviz_fetcher,
+                 discover_workers: int = 4, fetch_workers: int = 16, score_workers: int = 4,
+                 queue_size: int = 200, poll_seconds: float = 60.0, min_interval: float = 0.5):
+        """
+        Long-running discover -> fetch -> score -> store pipeline connected by bounded queues.
+        Memory stays bounded by the queue sizes, and each headline is scored as soon as it is discovered.
+
+        Args:
+            universe (List[str]): Tickers to discover news for.
+            news_dir (str): Directory of the `<TICKER>_today_news.csv` files.
+            sentiment_dir (str): Directory of the `*_with_sentiment.csv` files.
+            news_fetcher (Callable[[str], pd.DataFrame]): Returns the news table of a ticker.
+            discover_workers (int): Tickers whose news is fetched at the same time.
+            fetch_workers (int): Articles fetched at the same time.
+            score_workers (int): Articles scored at the same time (each on a worker process).
+            queue_size (int): Capacity of each queue between stages.
+            poll_seconds (float): Pause between two discovery passes over the universe.
+            min_interval (float): Minimum seconds between two news fetcher calls.
+        """
+        self.universe = universe
+        self.news_dir = news_dir
+        self.sentiment_dir = sentiment_dir
+        self.news_fetcher = news_fetcher
+        self.poll_seconds = poll_seconds
+        self.stop_event = threading.Event()
+        self.rate_limiter = get_news.HostRateLimiter(min_interval)
+        os.makedirs(news_dir, exist_ok=True)
+        # Headlines whose article could not be fetched, queued again on the next discovery pass
+        self.retry_items: List[dict] = []
+        self._retry_lock = threading.Lock()
+        self.news_index = get_news.load_news_index(os.path.join(news_dir, get_news.NEWS_INDEX_FILENAME), universe,
+                                                   news_dir)
+        self.sentiment_indexes = {}
+        self.context = analyze_news.AnalysisContext(sentiment_dir)
+        self.score_executor = ProcessPoolExecutor(max_workers=score_workers)
+
+        self.stages = [
+            Stage('discover', self.discover, discover_workers, queue_size),
+            Stage('fetch', self.fetch, fetch_workers, queue_size),
+            Stage('score', self.score, score_workers, queue_size),
+            Stage('store', self.store, 1, queue_size),
+        ]
+        for upstream, downstream in zip(self.stages, self.stages[1:]):
+            upstream.downstream = downstream
+
+    def discover(self, ticker: str) -> Iterable[dict]:
+        """
+        Fetch a ticker's news and emit the headlines not seen before.
+        """
+        self.rate_limiter.wait('finviz')
+        news_df = self.news_fetcher(ticker)
+        today = pd.Timestamp('today').normalize()
+        new_df = get_news.select_new_headlines(ticker, news_df, self.news_index, today)
+        if new_df.empty:
+            return []
+        get_news.save_headlines(ticker, new_df, self.news_dir, self.news_index, self.context.store)
+        print(f"Discovered {len(new_df)} new articles for {ticker}")
+        return [{'ticker': ticker, 'row': row} for row in new_df.to_dict('records')]
+
+    def fetch(self, item: dict) -> Iterable[dict]:
+        """
+        Fetch the article body of a headline. Headlines without content are fetched again on the
+        following discovery passes, up to MAX_FETCH_ATTEMPTS times.
+        """
+        if not isinstance(item['row'].get('Title'), str):
+            return []
+        content = self.context.fetch(item['row']['Link'])
+        if not content:
+            attempts = item.get('attempts', 0) + 1
+            if attempts < MAX_FETCH_ATTEMPTS:
+                with self._retry_lock:
+                    self.retry_items.append({**item, 'attempts': attempts})
+                metrics.inc('pipeline_fetch_retries_total')
+            else:
+                # The headline stays unscored in the news CSV and is picked up again by the next run
+                print(f"Giving up on {item['row']['Link']} after {attempts} attempts")
+            return []
+        return [{**item, 'content': content}]
+
+    def score(self, item: dict) -> Iterable[dict]:
+        """
+        Score the title and content of an article.
+        """
+        title = item['row']['Title']
+        title_sentiments, content_sentiments, chunk_scores = analyze_news.score_articles(
+            [title], [item['content']], executor=self.score_executor, cache=self.context.score_cache
+        )
+        title_sentiment, content_sentiment = title_sentiments[0], content_sentiments[0]
+        row = {
+            **item['row'],
+            'Title_Sentiment': title_sentiment,
+            'Content_Sentiment': content_sentiment,
+            # Calculate combined sentiment as the average of title and content sentiments
+            'Combined_Sentiment': (title_sentiment + content_sentiment) / 2,
+        }
+        return [{'ticker': item['ticker'], 'row': row, 'hash': content_hash(title, item['content']),
+                 'chunks': chunk_scores[0]}]
+
+    def store(self, item: dict) -> Iterable[dict]:
+        """
+        Append a scored article to its ticker's sentiment CSV. Runs on a single worker.
+        """
+        ticker = item['ticker']
+        output_file_path = os.path.join(self.sentiment_dir, f"{ticker}_today_news_with_sentiment.csv")
+        processed_index = self._sentiment_index(output_file_path)
+        if item['row']['Link'] in processed_index:
+            return []
+        analyze_news.save_scored_articles(pd.DataFrame([item['row']]), [item['hash']], ticker,
+                                          output_file_path, processed_index, [item['chunks']],
+                                          self.context.store, self.context.aggregates)
+        return []
+
+    def _sentiment_index(self, output_file_path: str):
+        if output_file_path not in self.sentiment_indexes:
+            self.sentiment_indexes[output_file_path] = analyze_news.load_processed_index(output_file_path)
+        return self.sentiment_indexes[output_file_path]
+
+    def unscored_items(self) -> List[dict]:
+        """
+        Headlines already in the news CSVs but not yet scored, e.g. because their article could not
+        be fetched before the previous run stopped. They are never discovered again, so the run starts with them.
+        """
+        items = []
+        for ticker in self.universe:
+            news_file_path = os.path.join(self.news_dir, f"{ticker}_today_news.csv")
+            if not os.path.exists(news_file_path) or os.path.getsize(news_file_path) == 0:
+                continue
+            output_file_path = os.path.join(self.sentiment_dir, f"{ticker}_today_news_with_sentiment.csv")
+            processed_index = self._sentiment_index(output_file_path)
+            news_df = pd.read_csv(news_file_path)
+            news_df = news_df[~news_df['Link'].isin(processed_index.keys())].drop_duplicates(subset=['Link'])
+            news_df['Date'] = get_news.parse_news_dates(news_df['Date'])
+            items.extend({'ticker': ticker, 'row': row} for row in news_df.to_dict('records'))
+        return items
+
+    def _take_retries(self) -> List[dict]:
+        with self._retry_lock:
+            items, self.retry_items = self.retry_items, []
+        return items
+
+    def stop(self):
+        """
+        Ask a running pipeline to stop discovering and drain.
+        """
+        self.stop_event.set()
+
+    def run(self, duration_seconds: Optional[float] = None, once: bool = False):
+        """
+        Run discovery passes until stopped, then drain the queues.
+
+        Args:
+            duration_seconds (float, optional): Stop discovering after this many seconds. Runs until interrupted if None.
+            once (bool): Make a single discovery pass, then drain and stop.
+        """
+        # Read before the stages start, as the sentiment indexes are otherwise only used by the store stage
+        backlog = self.unscored_items()
+        if backlog:
+            print(f"Retrying {len(backlog)} headlines left unscored by the previous run")
+        for stage in self.stages:
+            stage.start()
+        end_time = time.time() + duration_seconds if duration_seconds is not None else None
+
+        try:
+            while not self.stop_event.is_set():
+                # Queue the headlines whose fetch failed straight to the fetch stage, a pass after their last attempt
+                for item in backlog + self._take_retries():
+                    self.stages[1].input.put(item)
+                backlog = []
+                # Queue every ticker for discovery; blocks while the discover stage is busy
+                for ticker in self.universe:
+                    if self.stop_event.is_set():
+                        break
+                    self.stages[0].input.put(ticker)
+                if once or (end_time is not None and time.time() >= end_time):
+                    break
+                self.stop_event.wait(self.poll_seconds)
+        except KeyboardInterrupt:
+            print("Stopping pipeline...")
+        finally:
+            # Shut the stages down in order so every queued item is still processed
+            self.stages[0].stop()
+            for stage in self.stages:
+                stage.join()
+            self.score_executor.shutdown()
+            self.context.close()
+
+        for stage in self.stages:
+            print(f"{stage.name}: {stage.processed} items processed, {stage.errors} errors")
+        left = len(self._take_retries())
+        if left:
+            print(f"{left} headlines could not be fetched yet; they are retried by the next run")
+        metrics.write_reports(os.path.join(self.sentiment_dir, 'metrics'), 'pipeline')
+
+def main(config: Optional[Config] = None, duration_seconds: Optional[float] = None, once: bool = False):
+    """
+    Run the pipeline over the ticker universe until interrupted.
+
+    Args:
+        config (Config, optional): Directories and tickers. Loaded with `load_config` if None.
+        duration_seconds (float, optional): Stop discovering after this many seconds.
+        once (bool): Make a single discovery pass, then drain and stop.
+    """
+    config = config or load_config()
+    universe = config.universe()
+    pipeline = NewsPipeline(universe, config.output_dir, config.output_dir)
+    pipeline.run(duration_seconds, once)
+
+if __name__ == "__main__":
+    main()
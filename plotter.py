@@ -0,0 +1,233 @@
+import io
+import os
+import numpy as np
+import pandas as pd
+from PyQt5.QtCore import QTimer
+from PyQt5.QtWidgets import QApplication, QMainWindow, QVBoxLayout, QWidget
+import matplotlib.pyplot as plt
+import matplotlib.dates as mdates
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+from typing import List, Optional
+from config import load_config
+from history import load_prices
+
+class CsvTailer:
+    def __init__(self, csv_file: str):
+        """
+        Reads only the rows appended to a CSV file since the previous call.
+        `restarted` is set by a call that started over from the top of a truncated or replaced file.
+        """
+        self.csv_file = csv_file
+        self.offset = 0
+        self.header = None
+        self.file_id = None
+        self.restarted = False
+
+    def read_new_rows(self) -> pd.DataFrame:
+        """
+        Returns the complete rows written since the last call (empty if there are none).
+        A partially written last line is left for the next call.
+        """
+        self.restarted = False
+        if not os.path.exists(self.csv_file):
+            return pd.DataFrame()
+        # Start over if the file was truncated, or replaced by another file (as maintenance does)
+        stat = os.stat(self.csv_file)
+        file_id = (stat.st_dev, stat.st_ino)
+        if self.file_id is not None and (file_id != self.file_id or stat.st_size < self.offset):
+            self.offset = 0
+            self.header = None
+            self.restarted = True
+        self.file_id = file_id
+
+        with open(self.csv_file, 'rb') as file:
+            file.seek(self.offset)
+            chunk = file.read()
+        end = chunk.rfind(b'\n') + 1
+        if end == 0:
+            return pd.DataFrame()
+        self.offset += end
+        lines = chunk[:end].decode('utf-8')
+
+        if self.header is None:
+            self.header, _, lines = lines.partition('\n')
+            self.header = self.header.rstrip('\r')
+        if not lines.strip():
+            return pd.DataFrame()
+        return pd.read_csv(io.StringIO(self.header + '\n' + lines))
+
+class StockPlotter(QMainWindow):
+    def __init__(self, csv_file: str, live: bool = False, refresh_ms: int = 1000):
+        """
+        Initializes the main window for plotting stock prices.
+
+        Args:
+            csv_file (str): The export CSV to plot.
+            live (bool): Keep tailing the CSV and extend the lines as new rows arrive.
+            refresh_ms (int): How often the CSV is checked for new rows in live mode.
+        """
+        super().__init__()
+        self.setWindowTitle("Stock Price Plotter")
+        self.setGeometry(100, 100, 1200, 800)
+
+        # Create a central widget and set a layout
+        self.central_widget = QWidget()
+        self.setCentralWidget(self.central_widget)
+        self.layout = QVBoxLayout(self.central_widget)
+
+        # Create a matplotlib figure and axis
+        self.figure, self.ax = plt.subplots()
+        self.canvas = FigureCanvas(self.figure)
+        self.layout.addWidget(self.canvas)
+
+        if live:
+            self.start_live(csv_file, refresh_ms)
+        else:
+            # Plot the data from the CSV file
+            self.plot_data(csv_file)
+
+    def plot_data(self, csv_file: str, tickers: Optional[List[str]] = None, start: Optional[str] = None,
+                  end: Optional[str] = None):
+        """
+        Plots stock prices from the CSV file.
+
+        Args:
+            csv_file (str): The export CSV to plot.
+            tickers (List[str], optional): Tickers to plot. All if None.
+            start (str, optional): Earliest snapshot time to plot.
+            end (str, optional): Latest snapshot time to plot.
+        """
+        # Load only the needed columns, tickers and dates, in chunks, with categorical tickers and float32 prices
+        df = load_prices([csv_file], tickers, start, end)
+        if df.empty:
+            print(f"Error: The file {csv_file} is empty or cannot be read.")
+            return
+
+        # Clear existing plots
+        self.ax.clear()
+
+        # Plot stock prices for each ticker
+        for ticker, ticker_df in df.groupby('Ticker', observed=True):
+            self.ax.plot(ticker_df['Exported_At'], ticker_df['Price'], label=f'{ticker} Price')
+
+        # Set plot labels and title
+        self.ax.set_xlabel('Time')
+        self.ax.set_ylabel('Stock Price')
+        self.ax.set_title('Stock Prices Over Time')
+        self.ax.legend()
+        self.figure.tight_layout()
+        self.canvas.draw()
+
+    def start_live(self, csv_file: str, refresh_ms: int = 1000):
+        """
+        Tails the CSV file on a QTimer, extending each ticker's line in place.
+        """
+        self.tailer = CsvTailer(csv_file)
+        self.lines = {}
+        self.background = None
+
+        # Set plot labels and title once; lines are only extended afterwards
+        self.ax.clear()
+        self.ax.xaxis_date()
+        self.ax.set_xlabel('Time')
+        self.ax.set_ylabel('Stock Price')
+        self.ax.set_title('Stock Prices Over Time')
+
+        # Capture the static background after every full redraw, for blitting the lines on top
+        self.canvas.mpl_connect('draw_event', self._on_draw)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.update_live)
+        self.timer.start(refresh_ms)
+        self.update_live()
+
+    def _on_draw(self, event):
+        self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+        self._draw_lines()
+
+    def _draw_lines(self):
+        for line in self.lines.values():
+            self.ax.draw_artist(line)
+
+    def update_live(self):
+        """
+        Appends the rows written since the last update to the plotted lines.
+        """
+        df = self.tailer.read_new_rows()
+        if self.tailer.restarted:
+            # The file is read again from the top, so the lines are rebuilt instead of extended
+            for line in self.lines.values():
+                line.remove()
+            self.lines = {}
+            self.background = None
+            if self.ax.get_legend() is not None:
+                self.ax.get_legend().remove()
+        if df.empty or 'Exported_At' not in df.columns:
+            if self.tailer.restarted:
+                self.canvas.draw()
+            return
+        df['Exported_At'] = pd.to_datetime(df['Exported_At'], errors='coerce')
+        df = df.dropna(subset=['Exported_At', 'Price'])
+        df['Time_Num'] = mdates.date2num(df['Exported_At'])
+
+        needs_full_redraw = self.background is None
+        for ticker, ticker_df in df.groupby('Ticker', sort=False):
+            line = self.lines.get(ticker)
+            if line is None:
+                # New tickers get a new animated line and a full redraw for the legend
+                line, = self.ax.plot([], [], label=f'{ticker} Price', animated=True)
+                self.lines[ticker] = line
+                needs_full_redraw = True
+            xs = np.concatenate([line.get_xdata(), ticker_df['Time_Num'].to_numpy()])
+            ys = np.concatenate([line.get_ydata(), ticker_df['Price'].to_numpy(dtype=float)])
+            line.set_data(xs, ys)
+
+        # Rescale (full redraw) only when the new points fall outside the current view
+        x_min, x_max = df['Time_Num'].min(), df['Time_Num'].max()
+        y_min, y_max = df['Price'].min(), df['Price'].max()
+        (view_x0, view_x1), (view_y0, view_y1) = self.ax.get_xlim(), self.ax.get_ylim()
+        if x_min < view_x0 or x_max > view_x1 or y_min < view_y0 or y_max > view_y1:
+            needs_full_redraw = True
+
+        if needs_full_redraw:
+            self.ax.relim()
+            self.ax.autoscale_view()
+            # Leave headroom so the following updates can be blitted without rescaling
+            view_x0, view_x1 = self.ax.get_xlim()
+            view_y0, view_y1 = self.ax.get_ylim()
+            self.ax.set_xlim(view_x0, view_x1 + max((view_x1 - view_x0) * 0.25, 1 / 24))
+            y_pad = max((view_y1 - view_y0) * 0.1, 0.01)
+            self.ax.set_ylim(view_y0 - y_pad, view_y1 + y_pad)
+            # A legend is only readable for a handful of tickers
+            if len(self.lines) <= 20:
+                self.ax.legend(loc='upper left')
+            self.figure.tight_layout()
+            self.canvas.draw()
+        else:
+            self.canvas.restore_region(self.background)
+            self._draw_lines()
+            self.canvas.blit(self.figure.bbox)
+
+def show_plot(csv_file: str, live: bool = False, refresh_ms: int = 1000):
+    """
+    Opens the price window and blocks until it is closed.
+
+    Args:
+        csv_file (str): The export CSV to plot.
+        live (bool): Keep tailing the CSV and extend the lines as new rows arrive.
+        refresh_ms (int): How often the CSV is checked for new rows in live mode.
+    """
+    # Initialize and run the PyQt application
+    app = QApplication.instance() or QApplication([])
+    plotter = StockPlotter(csv_file, live=live, refresh_ms=refresh_ms)
+    plotter.show()
+    app.exec_()
+
+def main():
+    """
+    Plots the configured export CSV.
+    """
+    show_plot(load_config().export_file_path)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import hashlib
+import os
+import threading
+from typing import Callable, Dict, Iterable, Optional
+
+def content_hash(*parts: str) -> str:
+    """
+    Returns a short stable hash of the given text parts.
+    """
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update(str(part).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+class ProcessedIndex:
+    def __init__(self, index_path: str):
+        """
+        Append-only on-disk index of processed keys (e.g. article links) and their content hash.
+        The whole index is loaded once; new entries are appended as they are added.
+
+        Args:
+            index_path (str): Path of the tab-separated index file.
+        """
+        self.index_path = index_path
+        self._lock = threading.Lock()
+        self._entries: Dict[str, str] = {}
+        if os.path.exists(index_path):
+            with open(index_path, 'r', encoding='utf-8') as file:
+                for line in file:
+                    key, _, digest = line.rstrip('\n').partition('\t')
+                    if key:
+                        self._entries[key] = digest
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def keys(self):
+        """
+        Returns a set-like view of all processed keys.
+        """
+        return self._entries.keys()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Returns the content hash stored for `key`, or None if it was never processed.
+        """
+        return self._entries.get(key)
+
+    def add_many(self, items: Iterable):
+        """
+        Records (key, content hash) pairs, appending only keys that are not yet indexed.
+        """
+        with self._lock:
+            new_items = [(key, digest) for key, digest in items if key not in self._entries]
+            if not new_items:
+                return
+            with open(self.index_path, 'a', encoding='utf-8') as file:
+                for key, digest in new_items:
+                    file.write(f"{key}\t{digest}\n")
+                    self._entries[key] = digest
+
+    def add(self, key: str, digest: str = ''):
+        """
+        Records a single processed key.
+        """
+        self.add_many([(key, digest)])
+
+    def retain(self, keep: Callable[[str], bool]) -> int:
+        """
+        Removes the keys for which `keep` returns False and rewrites the index file without them.
+
+        Returns:
+            int: Number of keys removed.
+        """
+        with self._lock:
+            removed = [key for key in self._entries if not keep(key)]
+            if not removed:
+                return 0
+            for key in removed:
+                del self._entries[key]
+            # Written under a temporary name so a crash never leaves a partial index
+            with open(f"{self.index_path}.tmp", 'w', encoding='utf-8') as file:
+                for key, digest in self._entries.items():
+                    file.write(f"{key}\t{digest}\n")
+            os.replace(f"{self.index_path}.tmp", self.index_path)
+        return len(removed)
+
+    def clear(self) -> int:
+        """
+        Removes every key, e.g. when the file the index describes was emptied.
+
+        Returns:
+            int: Number of keys removed.
+        """
+        return self.retain(lambda key: False)
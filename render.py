@@ -0,0 +1,172 @@
+import datetime
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+
+from alignment import time_of_day
+from config import Config, load_config
+from history import history_files, load_prices, load_sentiment
+import metrics
+
+# Bump when the chart drawing changes, so every chart is rendered again once
+CHART_VERSION = 1
+# Formats matplotlib's Agg and SVG canvases can write without a display
+CHART_FORMATS = ('png', 'svg')
+# Columns a chart is drawn from; only these go into the data hash
+SENTIMENT_CHART_COLUMNS = ['Date', 'Combined_Sentiment']
+PRICE_CHART_COLUMNS = ['Exported_At', 'Price']
+
+def chart_data_hash(sentiment_df: pd.DataFrame, price_df: pd.DataFrame) -> str:
+    """
+    Hashes the rows and columns a ticker's chart is drawn from, plus CHART_VERSION.
+    """
+    digest = hashlib.sha1(f"v{CHART_VERSION}".encode())
+    for df, columns in ((sentiment_df, SENTIMENT_CHART_COLUMNS), (price_df, PRICE_CHART_COLUMNS)):
+        digest.update(str(len(df)).encode())
+        if not df.empty:
+            digest.update(pd.util.hash_pandas_object(df[columns], index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+def load_manifest(manifest_path: str) -> Dict[str, Dict]:
+    """
+    Loads the ticker -> {'hash', 'path', 'rendered_at'} record of the last render.
+    """
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+def save_manifest(manifest: Dict[str, Dict], manifest_path: str):
+    # Written under a temporary name so an interrupted save never leaves a partial manifest
+    with open(f"{manifest_path}.tmp", 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+    os.replace(f"{manifest_path}.tmp", manifest_path)
+
+def render_chart(ticker: str, sentiment_df: pd.DataFrame, price_df: pd.DataFrame, output_path: str) -> float:
+    """
+    Draws one ticker's chart to a PNG or SVG file without a display. Runs in a worker process.
+
+    Returns:
+        float: Seconds spent drawing and saving.
+    """
+    started = time.perf_counter()
+    # A bare Figure on a non-interactive canvas: no pyplot state and no GUI backend in the workers
+    from matplotlib.figure import Figure
+    from bothplot import draw_ticker_chart
+
+    # Same time-of-day axis as bothplot.py, so several days overlay
+    sentiment_df = sentiment_df.assign(Time_Datetime=time_of_day(sentiment_df['Date'])).sort_values('Time_Datetime')
+    price_df = price_df.assign(Time_Datetime=time_of_day(price_df['Exported_At'])).sort_values('Time_Datetime')
+
+    fig = Figure(figsize=(12, 6))
+    draw_ticker_chart(fig, ticker, sentiment_df, price_df)
+    fig.savefig(f"{output_path}.tmp", format=os.path.splitext(output_path)[1][1:])
+    os.replace(f"{output_path}.tmp", output_path)
+    return time.perf_counter() - started
+
+def render_charts(sentiment_df: pd.DataFrame, price_df: pd.DataFrame, charts_dir: str, chart_format: str = 'png',
+                  max_workers: Optional[int] = None, force: bool = False) -> Tuple[int, int]:
+    """
+    Renders one chart per ticker of `sentiment_df` across a process pool, skipping tickers whose
+    chart data is unchanged since the last render (as recorded in `<charts_dir>/manifest.json`).
+
+    Args:
+        sentiment_df (pd.DataFrame): Articles of every ticker ('Ticker', 'Date', 'Combined_Sentiment').
+        price_df (pd.DataFrame): Snapshots of every ticker ('Ticker', 'Exported_At', 'Price').
+        charts_dir (str): Directory the `<TICKER>.<format>` files and the manifest are written to.
+        chart_format (str): 'png' or 'svg'.
+        max_workers (int, optional): Worker processes. Defaults to the number of CPUs.
+        force (bool): Render every ticker even if its data is unchanged.
+
+    Returns:
+        Tuple[int, int]: Number of charts rendered and skipped.
+    """
+    if chart_format not in CHART_FORMATS:
+        raise ValueError(f"Unsupported chart format {chart_format}; expected one of {CHART_FORMATS}")
+    os.makedirs(charts_dir, exist_ok=True)
+    manifest_path = os.path.join(charts_dir, 'manifest.json')
+    manifest = load_manifest(manifest_path)
+
+    # Split both frames by ticker once, keeping only the columns the chart uses
+    sentiment_by_ticker = dict(tuple(sentiment_df[['Ticker'] + SENTIMENT_CHART_COLUMNS].groupby('Ticker', observed=True)))
+    price_by_ticker = dict(tuple(price_df[['Ticker'] + PRICE_CHART_COLUMNS].groupby('Ticker', observed=True)))
+    empty_price_df = price_df[['Ticker'] + PRICE_CHART_COLUMNS].iloc[0:0]
+
+    pending = {}
+    for ticker, ticker_sentiment_df in sentiment_by_ticker.items():
+        ticker = str(ticker)
+        ticker_price_df = price_by_ticker.get(ticker, empty_price_df)
+        data_hash = chart_data_hash(ticker_sentiment_df, ticker_price_df)
+        output_path = os.path.join(charts_dir, f"{ticker}.{chart_format}")
+        previous = manifest.get(ticker, {})
+        if not force and previous.get('hash') == data_hash and previous.get('path') == output_path \
+                and os.path.exists(output_path):
+            metrics.inc('charts_total', result='skipped')
+            continue
+        pending[ticker] = (ticker_sentiment_df, ticker_price_df, output_path, data_hash)
+
+    skipped = len(sentiment_by_ticker) - len(pending)
+    rendered = 0
+    if pending:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(render_chart, ticker, ticker_sentiment_df, ticker_price_df, output_path): ticker
+                for ticker, (ticker_sentiment_df, ticker_price_df, output_path, _) in pending.items()
+            }
+            for future in as_completed(futures):
+                ticker = futures[future]
+                try:
+                    seconds = future.result()
+                except Exception as e:
+                    print(f"Error rendering chart for {ticker}: {e}")
+                    metrics.inc('charts_total', result='error')
+                    continue
+                _, _, output_path, data_hash = pending[ticker]
+                # Only charts that were written are recorded, so failed ones are retried next time
+                manifest[ticker] = {'hash': data_hash, 'path': output_path,
+                                    'rendered_at': datetime.datetime.now().isoformat(timespec='seconds')}
+                metrics.observe('chart_render_seconds', seconds)
+                metrics.inc('charts_total', result='rendered')
+                rendered += 1
+
+    save_manifest(manifest, manifest_path)
+    return rendered, skipped
+
+def main(config: Optional[Config] = None, chart_format: str = 'png', start: Optional[str] = None,
+         end: Optional[str] = None, charts_dir: Optional[str] = None, max_workers: Optional[int] = None,
+         force: bool = False):
+    """
+    Renders the sentiment and price chart of every configured ticker that has new data.
+
+    Args:
+        config (Config, optional): Directories and tickers. Loaded with `load_config` if None.
+        chart_format (str): 'png' or 'svg'.
+        start (str, optional): Earliest time to draw.
+        end (str, optional): Latest time to draw.
+        charts_dir (str, optional): Output directory. Defaults to `<output_dir>/charts`.
+        max_workers (int, optional): Worker processes. Defaults to the number of CPUs.
+        force (bool): Render every ticker even if its data is unchanged.
+    """
+    config = config or load_config()
+    universe = config.universe()
+    charts_dir = charts_dir or os.path.join(config.output_dir, 'charts')
+
+    # Load the history of every ticker, including the days archived by maintenance
+    sentiment_file_paths = [path for ticker in universe
+                            for path in history_files(config.output_dir, f'{ticker}_today_news_with_sentiment.csv',
+                                                      start, end)]
+    price_file_paths = history_files(config.output_dir, os.path.basename(config.export_file_path), start, end)
+    sentiment_df = load_sentiment(sentiment_file_paths, universe, start, end)
+    price_df = load_prices(price_file_paths, universe, start, end)
+
+    rendered, skipped = render_charts(sentiment_df, price_df, charts_dir, chart_format, max_workers, force)
+    metrics.write_reports(config.metrics_dir, 'render')
+    print(f"Rendered {rendered} charts to {charts_dir}, {skipped} unchanged")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import metrics
+
+# Function to analyze sentiment of text
+def analyze_sentiment(text: str) -> float:
+    """
+    Analyze the sentiment of the given text and return the sentiment score.
+
+    Args:
+        text (str): The text to analyze.
+
+    Returns:
+        float: The sentiment score.
+    """
+    # finvader loads NLTK and its lexicons, so it is imported only when something is scored
+    from finvader import finvader
+
+    # Perform sentiment analysis using Finvader
+    sentiment_result = finvader(text, use_sentibignomics=True, use_henry=True, indicator='compound')
+
+    # Check if the result is a dictionary and contains 'compound' key
+    if isinstance(sentiment_result, dict) and 'compound' in sentiment_result:
+        return sentiment_result['compound']
+    return sentiment_result if isinstance(sentiment_result, float) else 0.0
+
+def normalize_text(text: str) -> str:
+    """
+    Collapses whitespace so that the same text copied between pages hashes identically.
+    """
+    return re.sub(r'\s+', ' ', str(text)).strip()
+
+def text_hash(text: str) -> str:
+    """
+    Returns the hash of a normalized text, used as its score cache key.
+    """
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+def _score_chunk(texts: List[str]) -> Tuple[List[float], float]:
+    """
+    Scores a chunk of texts in a worker process and reports how long it took.
+    """
+    started = time.perf_counter()
+    scores = [analyze_sentiment(text) for text in texts]
+    return scores, time.perf_counter() - started
+
+class ScoreCache:
+    def __init__(self, db_path: Optional[str] = None, max_memory_entries: int = 100000):
+        """
+        Memoizes sentiment scores by text hash: an in-memory LRU backed by SQLite.
+
+        Args:
+            db_path (str, optional): Path of the SQLite file. If None, scores are kept in memory only.
+            max_memory_entries (int): Number of scores held in the in-memory LRU.
+        """
+        self.max_memory_entries = max_memory_entries
+        self._memory: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        if db_path is not None:
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            self._conn.execute("CREATE TABLE IF NOT EXISTS scores (hash TEXT PRIMARY KEY, score REAL)")
+            self._conn.commit()
+
+    def _remember(self, key: str, score: float):
+        self._memory[key] = score
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, float]:
+        """
+        Returns the cached scores for the given keys; missing keys are left out.
+        """
+        found = {}
+        with self._lock:
+            missing = []
+            for key in keys:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[key] = self._memory[key]
+                else:
+                    missing.append(key)
+
+            # Fall back to the on-disk store for keys not in memory
+            if self._conn is not None and missing:
+                for start in range(0, len(missing), 500):
+                    batch = missing[start:start + 500]
+                    placeholders = ','.join('?' * len(batch))
+                    rows = self._conn.execute(
+                        f"SELECT hash, score FROM scores WHERE hash IN ({placeholders})", batch
+                    ).fetchall()
+                    for key, score in rows:
+                        found[key] = score
+                        self._remember(key, score)
+        return found
+
+    def put_many(self, scores: Dict[str, float]):
+        """
+        Stores scores keyed by text hash.
+        """
+        with self._lock:
+            for key, score in scores.items():
+                self._remember(key, score)
+            if self._conn is not None and scores:
+                self._conn.executemany("INSERT OR REPLACE INTO scores VALUES (?, ?)", scores.items())
+                self._conn.commit()
+
+    def trim(self, max_entries: int) -> int:
+        """
+        Removes the oldest written scores from the on-disk store until at most `max_entries` remain.
+
+        Returns:
+            int: Number of scores removed.
+        """
+        with self._lock:
+            if self._conn is None:
+                return 0
+            # Scores are written with INSERT OR REPLACE, so the rowid orders them by last write
+            removed = self._conn.execute(
+                "DELETE FROM scores WHERE rowid <= (SELECT rowid FROM scores ORDER BY rowid DESC LIMIT 1 OFFSET ?)",
+                (max_entries,),
+            ).rowcount
+            self._conn.commit()
+        return removed
+
+    def close(self):
+        """
+        Closes the on-disk store.
+        """
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+def score_texts(texts: List[str], cache: Optional[ScoreCache] = None, executor: Optional[Executor] = None,
+                chunk_size: int = 32) -> List[float]:
+    """
+    Score a batch of texts, scoring each distinct text only once.
+
+    Args:
+        texts (List[str]): The texts to score.
+        cache (ScoreCache, optional): Cache of previously computed scores.
+        executor (Executor, optional): Pool the chunks are sent to. If None, a process
+            pool is created for the call when there is more than one chunk to score.
+        chunk_size (int): Number of texts sent to a worker at a time.
+
+    Returns:
+        List[float]: The sentiment score of each text, in input order.
+    """
+    normalized = [normalize_text(text) for text in texts]
+    keys = [text_hash(text) for text in normalized]
+
+    # Distinct texts that are not cached yet
+    scores = cache.get_many(set(keys)) if cache is not None else {}
+    pending = {key: text for key, text in zip(keys, normalized) if key not in scores}
+    metrics.inc('score_cache_total', len(set(keys)) - len(pending), result='hit')
+    metrics.inc('score_cache_total', len(pending), result='miss')
+
+    if pending:
+        pending_keys = list(pending)
+        chunks = [pending_keys[start:start + chunk_size] for start in range(0, len(pending_keys), chunk_size)]
+        chunk_texts = [[pending[key] for key in chunk] for chunk in chunks]
+
+        if executor is not None:
+            results = executor.map(_score_chunk, chunk_texts)
+        elif len(chunks) > 1:
+            with ProcessPoolExecutor(max_workers=min(len(chunks), os.cpu_count() or 1)) as pool:
+                results = list(pool.map(_score_chunk, chunk_texts))
+        else:
+            results = map(_score_chunk, chunk_texts)
+
+        new_scores = {}
+        for chunk, texts_of_chunk, (chunk_scores, seconds) in zip(chunks, chunk_texts, results):
+            new_scores.update(zip(chunk, chunk_scores))
+            kilobytes = sum(len(text.encode('utf-8')) for text in texts_of_chunk) / 1024
+            metrics.observe('finvader_seconds_per_kb', seconds / max(kilobytes, 1e-3))
+            metrics.inc('finvader_kilobytes_total', kilobytes)
+        if cache is not None:
+            cache.put_many(new_scores)
+        scores.update(new_scores)
+
+    return [scores[key] for key in keys]
+
+def split_into_chunks(text: str, token_budget: int = 200) -> List[str]:
+    """
+    Splits text into chunks of whole sentences holding at most `token_budget`
+    whitespace-separated tokens; longer sentences are cut at the budget.
+    """
+    chunks = []
+    current: List[str] = []
+    for sentence in re.split(r'(?<=[.!?])\s+', normalize_text(text)):
+        words = sentence.split()
+        while len(words) > token_budget:
+            if current:
+                chunks.append(' '.join(current))
+                current = []
+            chunks.append(' '.join(words[:token_budget]))
+            words = words[token_budget:]
+        if current and len(current) + len(words) > token_budget:
+            chunks.append(' '.join(current))
+            current = []
+        current.extend(words)
+    if current:
+        chunks.append(' '.join(current))
+    return chunks
+
+def select_chunks(chunks: List[str], max_chunks: int) -> List[str]:
+    """
+    Keeps at most `max_chunks` chunks, spread evenly over the text.
+    """
+    if len(chunks) <= max_chunks:
+        return chunks
+    step = len(chunks) / max_chunks
+    return [chunks[int(position * step)] for position in range(max_chunks)]
+
+def score_chunked(texts: List[str], token_budget: int = 200, max_chunks: int = 16,
+                  cache: Optional[ScoreCache] = None, executor: Optional[Executor] = None) -> List[Tuple[float, List[Tuple[int, float]]]]:
+    """
+    Scores long texts chunk by chunk with bounded work per text.
+
+    Every text is split into chunks of at most `token_budget` tokens, and at most `max_chunks`
+    chunks (spread over the text) are scored, so the cost of one text is capped whatever its size.
+    All chunks of all texts are scored in one `score_texts` batch.
+
+    Args:
+        texts (List[str]): The texts to score.
+        token_budget (int): Maximum number of tokens per chunk.
+        max_chunks (int): Maximum number of chunks scored per text.
+        cache (ScoreCache, optional): Cache of previously computed scores.
+        executor (Executor, optional): Pool the chunks are scored on.
+
+    Returns:
+        List[Tuple[float, List[Tuple[int, float]]]]: For every text, the token-weighted mean of
+            its chunk scores and the (tokens, score) of each scored chunk.
+    """
+    selected = [select_chunks(split_into_chunks(text, token_budget), max_chunks) for text in texts]
+    flat_chunks = [chunk for chunks in selected for chunk in chunks]
+    flat_scores = iter(score_texts(flat_chunks, cache=cache, executor=executor))
+
+    results = []
+    for chunks in selected:
+        chunk_scores = [(len(chunk.split()), next(flat_scores)) for chunk in chunks]
+        total_tokens = sum(tokens for tokens, _ in chunk_scores)
+        weighted = sum(tokens * score for tokens, score in chunk_scores) / total_tokens if total_tokens else 0.0
+        results.append((weighted, chunk_scores))
+    return results
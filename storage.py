@@ -0,0 +1,188 @@
+import os
+import uuid
+from typing import Iterable, List, Optional
+
+import pandas as pd
+
+class PartitionedStore:
+    def __init__(self, root_dir: str):
+        """
+        Append-only Parquet store partitioned by date, with the ticker kept as a column.
+
+        Every append writes one new file per date it touches, laid out as
+        `<root_dir>/<dataset>/date=YYYY-MM-DD/part-*.parquet`, so the cost of a write is the size
+        of the new rows. `compact` merges a date's files into one, sorted by ticker and time.
+        Stores written with the older `date=YYYY-MM-DD/ticker=<TICKER>/` layout are still read.
+
+        Args:
+            root_dir (str): Directory holding one sub-directory per dataset.
+        """
+        self.root_dir = root_dir
+        os.makedirs(root_dir, exist_ok=True)
+
+    @staticmethod
+    def _typed(df: pd.DataFrame, time_column: str) -> pd.DataFrame:
+        """
+        Applies the store's schema: timestamps for the time column, categorical tickers.
+        """
+        df = df.copy()
+        df[time_column] = pd.to_datetime(df[time_column], errors='coerce')
+        df['Ticker'] = df['Ticker'].astype(str).astype('category')
+        return df.dropna(subset=[time_column])
+
+    def append(self, dataset: str, df: pd.DataFrame, time_column: str) -> int:
+        """
+        Appends rows to a dataset, one new file per date partition.
+
+        Args:
+            dataset (str): Dataset name, e.g. 'export', 'news' or 'sentiment'.
+            df (pd.DataFrame): Rows to append; must contain 'Ticker' and `time_column`.
+            time_column (str): Column whose date selects the partition.
+
+        Returns:
+            int: Number of rows written.
+        """
+        if df.empty:
+            return 0
+        # pyarrow is imported on first use so that importing the store stays cheap
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        df = self._typed(df, time_column)
+        part_name = f"part-{pd.Timestamp.now().strftime('%Y%m%d%H%M%S%f')}-{uuid.uuid4().hex[:8]}.parquet"
+
+        written = 0
+        dates = df[time_column].dt.strftime('%Y-%m-%d')
+        for date, partition_df in df.groupby(dates):
+            partition_dir = os.path.join(self.root_dir, dataset, f"date={date}")
+            os.makedirs(partition_dir, exist_ok=True)
+            table = pa.Table.from_pandas(partition_df, preserve_index=False)
+            pq.write_table(table, os.path.join(partition_dir, part_name))
+            written += len(partition_df)
+        return written
+
+    def compact(self, dataset: str, time_column: str, key_columns: Optional[List[str]] = None,
+                before: Optional[pd.Timestamp] = None) -> int:
+        """
+        Merges the files of every date partition of a dataset into a single file sorted by
+        ticker and time, so reads open one file per date instead of one per append.
+        Later copies of a key are dropped, as clear.py does for the CSVs.
+
+        Run it while nothing is appending to the store, e.g. with clear.py's maintenance.
+
+        Args:
+            dataset (str): Dataset name.
+            time_column (str): Column the rows are sorted by within a ticker.
+            key_columns (List[str], optional): Columns identifying a row. Duplicates are kept if None.
+            before (pd.Timestamp, optional): Only compact dates before this day. All dates if None.
+
+        Returns:
+            int: Number of files compacted.
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        dataset_dir = os.path.join(self.root_dir, dataset)
+        if not os.path.isdir(dataset_dir):
+            return 0
+        before_date = pd.Timestamp(before).strftime('%Y-%m-%d') if before is not None else None
+
+        merged = 0
+        for date_dir in sorted(os.listdir(dataset_dir)):
+            if not date_dir.startswith('date=') or (before_date and date_dir.partition('=')[2] >= before_date):
+                continue
+            partition_dir = os.path.join(dataset_dir, date_dir)
+            paths = self._date_files(partition_dir)
+            # A day already compacted into a single file has nothing left to merge
+            if not paths or (len(paths) == 1 and paths[0].endswith('-compacted.parquet')):
+                continue
+            # Frames are combined by pandas, as snapshots of different polls can infer different dtypes.
+            # Files are listed oldest first, so the first copy of a key is the one written first
+            df = pd.concat([pq.read_table(path).to_pandas() for path in paths], ignore_index=True)
+            df = self._typed(df, time_column)
+            if key_columns:
+                df = df.drop_duplicates(subset=key_columns)
+            df = df.sort_values(['Ticker', time_column], kind='stable')
+            compacted_path = os.path.join(
+                partition_dir, f"part-{pd.Timestamp.now().strftime('%Y%m%d%H%M%S%f')}-compacted.parquet")
+            # Written under a temporary name first, so a crash never leaves a truncated file to read
+            pq.write_table(pa.Table.from_pandas(df, preserve_index=False), f"{compacted_path}.tmp")
+            os.replace(f"{compacted_path}.tmp", compacted_path)
+            for path in paths:
+                os.remove(path)
+                if os.path.dirname(path) != partition_dir and not os.listdir(os.path.dirname(path)):
+                    os.rmdir(os.path.dirname(path))
+            merged += len(paths)
+        return merged
+
+    @staticmethod
+    def _date_files(partition_dir: str, ticker_set: Optional[set] = None) -> List[str]:
+        """
+        Lists the Parquet files of a date partition, including those of older `ticker=` sub-directories.
+        """
+        files = []
+        for name in sorted(os.listdir(partition_dir)):
+            path = os.path.join(partition_dir, name)
+            if name.endswith('.parquet'):
+                files.append(path)
+            elif name.startswith('ticker=') and os.path.isdir(path):
+                if ticker_set is not None and name.partition('=')[2] not in ticker_set:
+                    continue
+                files.extend(os.path.join(path, part) for part in sorted(os.listdir(path)) if part.endswith('.parquet'))
+        return files
+
+    def partition_files(self, dataset: str, tickers: Optional[Iterable[str]] = None,
+                        start: Optional[pd.Timestamp] = None, end: Optional[pd.Timestamp] = None) -> List[str]:
+        """
+        Lists the Parquet files of the date partitions in range, without opening any file.
+        Tickers only prune the `ticker=` sub-directories of the older layout; `read` filters the rest.
+        """
+        dataset_dir = os.path.join(self.root_dir, dataset)
+        if not os.path.isdir(dataset_dir):
+            return []
+        ticker_set = set(tickers) if tickers is not None else None
+        start_date = pd.Timestamp(start).strftime('%Y-%m-%d') if start is not None else None
+        end_date = pd.Timestamp(end).strftime('%Y-%m-%d') if end is not None else None
+
+        files = []
+        for date_dir in sorted(os.listdir(dataset_dir)):
+            date = date_dir.partition('=')[2]
+            if (start_date and date < start_date) or (end_date and date > end_date):
+                continue
+            files.extend(self._date_files(os.path.join(dataset_dir, date_dir), ticker_set))
+        return files
+
+    def read(self, dataset: str, time_column: str, tickers: Optional[Iterable[str]] = None,
+             start: Optional[pd.Timestamp] = None, end: Optional[pd.Timestamp] = None,
+             columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Reads the rows of a dataset, loading only the partitions that match the filters.
+
+        Args:
+            dataset (str): Dataset name.
+            time_column (str): Column the date range applies to.
+            tickers (Iterable[str], optional): Tickers to load. All if None.
+            start (pd.Timestamp, optional): Earliest time to load (inclusive).
+            end (pd.Timestamp, optional): Latest time to load (inclusive).
+            columns (List[str], optional): Columns to load. All if None.
+
+        Returns:
+            pd.DataFrame: The matching rows sorted by `time_column`.
+        """
+        import pyarrow.parquet as pq
+
+        if columns is not None:
+            columns = list(dict.fromkeys(list(columns) + ['Ticker', time_column]))
+        # Rows of other tickers are dropped by pyarrow while each file is read
+        filters = [('Ticker', 'in', sorted(set(tickers)))] if tickers is not None else None
+        frames = [pq.read_table(path, columns=columns, filters=filters).to_pandas()
+                  for path in self.partition_files(dataset, tickers, start, end)]
+        if not frames:
+            return pd.DataFrame(columns=columns or ['Ticker', time_column])
+
+        df = self._typed(pd.concat(frames, ignore_index=True), time_column)
+        if start is not None:
+            df = df[df[time_column] >= pd.Timestamp(start)]
+        if end is not None:
+            df = df[df[time_column] <= pd.Timestamp(end)]
+        return df.sort_values(time_column, kind='stable').reset_index(drop=True)